@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Fragment download benchmark.
+Serves synthetic media from a local HTTP server that behaves like a video CDN:
+every request waits for a round trip before its first byte, every connection
+is rate limited, and a single request that runs past --burst bytes is slowed
+down. Downloads an HLS playlist of fragments and a progressive file with
+yt-dlp's defaults and with each quality's PERFORMANCE_PROFILES entry, then
+reports the throughput of each. Runs offline; ffmpeg is not needed.
+
+Usage: python benchmarks/fragments.py [--fragments 32] [--fragment-size 1] [--runs 3]
+"""
+
+import argparse
+import http.server
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+
+from playlist_downloader.engine import PERFORMANCE_PROFILES
+
+MIB = 1024 * 1024
+WRITE_SIZE = 64 * 1024
+
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /media.m3u8, its /seg<N>.ts fragments and /media.mp4, with Range support."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        if self.path == '/media.m3u8':
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+            for index in range(config.fragments):
+                lines += ['#EXTINF:4.0,', f'seg{index}.ts']
+            lines.append('#EXT-X-ENDLIST')
+            self.send_body(('\n'.join(lines) + '\n').encode(), 'application/vnd.apple.mpegurl')
+            return
+        if re.fullmatch(r'/seg\d+\.ts', self.path):
+            self.send_media(config.fragment_size * MIB, 'video/mp2t')
+        elif self.path == '/media.mp4':
+            self.send_media(config.fragments * config.fragment_size * MIB, 'video/mp4')
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, size, content_type):
+        config = self.server.config
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        time.sleep(config.latency)
+        if match:
+            start = int(match.group(1))
+            end = min(end, int(match.group(2))) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        block = self.server.block
+        began = time.monotonic()
+        sent = 0
+        try:
+            while start + sent <= end:
+                count = min(WRITE_SIZE, end - start - sent + 1)
+                self.wfile.write(block[:count])
+                sent += count
+                # Full rate for the first burst bytes of a request, then throttled
+                fast = min(sent, config.burst * MIB)
+                due = fast / (config.rate * MIB) + (sent - fast) / (config.throttled_rate * MIB)
+                delay = began + due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        except OSError:
+            pass
+
+
+def serve(config):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.block = os.urandom(WRITE_SIZE)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def download_once(url, options):
+    """Download url into a fresh directory; returns (seconds, bytes)."""
+    target = tempfile.mkdtemp(prefix='fragments-bench-')
+    try:
+        ydl_opts = {
+            'outtmpl': os.path.join(target, 'media.%(ext)s'),
+            'format': 'best',
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'fixup': 'never',
+            'cachedir': False,
+            **options,
+        }
+        start = time.perf_counter()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            if ydl.download([url]):
+                raise RuntimeError(f"download of {url} failed")
+        seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(target, name)) for name in os.listdir(target))
+        return seconds, size
+    finally:
+        shutil.rmtree(target, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fragments', type=int, default=32, help="fragments in the HLS playlist")
+    parser.add_argument('--fragment-size', type=int, default=1, help="MiB per fragment")
+    parser.add_argument('--latency', type=float, default=0.03, help="seconds before each response")
+    parser.add_argument('--rate', type=float, default=8, help="MiB/s per connection")
+    parser.add_argument('--burst', type=float, default=12, help="MiB a request gets at full rate")
+    parser.add_argument('--throttled-rate', type=float, default=2, help="MiB/s after the burst")
+    parser.add_argument('--runs', type=int, default=3, help="downloads per case (median is reported)")
+    args = parser.parse_args()
+
+    server = serve(args)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    profiles = {'yt-dlp defaults': {}, **PERFORMANCE_PROFILES}
+    try:
+        for label, url in (('HLS fragments', f'{base}/media.m3u8'), ('progressive file', f'{base}/media.mp4')):
+            print(f"{label}: {args.fragments * args.fragment_size} MiB")
+            baseline = None
+            for name, options in profiles.items():
+                results = [download_once(url, options) for _ in range(args.runs)]
+                seconds = statistics.median(result[0] for result in results)
+                throughput = results[0][1] / seconds / MIB
+                baseline = baseline or throughput
+                print(f"  {name:16} {seconds:7.2f} s  {throughput:7.1f} MiB/s  x{throughput / baseline:4.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark of per-video state.
+Measures, with tracemalloc, the bytes per video of three ways to hold the
+state of a large playlist (a dict per video, a __slots__ object per video and
+the engine's VideoStates arrays), of a full yt-dlp info dict against the flat
+entry the engine keeps after format selection, and the peak memory of a
+complete engine run against the offline benchmark's local server.
+
+Usage: python benchmarks/memory.py [--videos 10000] [--engine-videos 500]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import shutil
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from playlist_downloader.playlist import flat_entry
+from playlist_downloader.state import VideoStates, VideoStatus
+
+KIB = 1024
+MIB = 1024 * 1024
+
+
+class SlotsVideo:
+    __slots__ = ('video_id', 'index', 'status', 'downloaded_bytes', 'total_bytes')
+
+    def __init__(self, video_id, index):
+        self.video_id = video_id
+        self.index = index
+        self.status = VideoStatus.LISTED
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+
+
+def dict_store(ids):
+    store = {}
+    for index, video_id in enumerate(ids, 1):
+        store[video_id] = {'video_id': video_id, 'index': index, 'status': 'listed',
+                           'downloaded_bytes': 0, 'total_bytes': 0}
+    for video_id in ids:
+        store[video_id]['status'] = 'done'
+        store[video_id]['downloaded_bytes'] = store[video_id]['total_bytes'] = 123_456_789
+    return store
+
+
+def slots_store(ids):
+    store = {}
+    for index, video_id in enumerate(ids, 1):
+        store[video_id] = SlotsVideo(video_id, index)
+    for video_id in ids:
+        video = store[video_id]
+        video.status = VideoStatus.DONE
+        video.downloaded_bytes = video.total_bytes = 123_456_789
+    return store
+
+
+def array_store(ids):
+    store = VideoStates()
+    for index, video_id in enumerate(ids, 1):
+        store.add(video_id, index)
+    for video_id in ids:
+        store.set_status(video_id, VideoStatus.DONE)
+        store.set_bytes(video_id, 123_456_789, 123_456_789)
+    return store
+
+
+def full_info(video_id, index):
+    """Synthetic info dict shaped like a resolved YouTube video (24 formats)."""
+    formats = [{
+        'format_id': str(100 + n), 'format_note': f'{144 * (n % 6 + 1)}p', 'ext': 'mp4' if n % 2 else 'webm',
+        'url': f'https://rr{n}.example.com/videoplayback?id={video_id}&itag={100 + n}&' + 'x' * 600,
+        'width': 256 * (n % 6 + 1), 'height': 144 * (n % 6 + 1), 'fps': 30, 'tbr': 100.0 * n,
+        'vcodec': 'avc1.4d401e', 'acodec': 'none', 'filesize': 1_000_000 * n, 'protocol': 'https',
+        'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*', 'Accept-Language': 'en-us'},
+        'downloader_options': {'http_chunk_size': 10485760}, 'quality': n, 'has_drm': False,
+    } for n in range(24)]
+    return {
+        'id': video_id, 'title': f'Video {index}', 'extractor_key': 'Youtube',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}', 'duration': 600,
+        'description': 'Lorem ipsum dolor sit amet. ' * 40, 'formats': formats,
+        'thumbnails': [{'url': f'https://i.ytimg.com/vi/{video_id}/{n}.jpg', 'width': 120 * n} for n in range(40)],
+        'tags': [f'tag{n}' for n in range(20)], 'categories': ['Music'],
+    }
+
+
+def traced(build, *args):
+    """(result, bytes allocated by build and still alive)."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(*args)
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def engine_peak(videos, stream):
+    """Peak traced memory (MiB) of downloading a playlist of tiny videos."""
+    import offline
+    config = dict(offline.SCENARIOS['large'], videos=videos, size_kib=4, latency=0)
+    server = offline.serve(config)
+    target = tempfile.mkdtemp(prefix='memory-bench-')
+    try:
+        gc.collect()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        with offline.BenchmarkEngine(target, max_workers=config['workers'], stream=stream) as engine:
+            engine.download(f'http://127.0.0.1:{server.server_address[1]}/playlist/bench')
+            counts = engine.videos.counts()
+        return (tracemalloc.get_traced_memory()[1] - start) / MIB, counts
+    finally:
+        server.shutdown()
+        shutil.rmtree(target, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=10_000, help="videos in the state comparison")
+    parser.add_argument('--engine-videos', type=int, default=500,
+                        help="videos in the engine runs (0 skips them)")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    ids = [f'{n:011d}' for n in range(args.videos)]
+    print(f"State of {args.videos} videos (bytes per video, id strings excluded):")
+    for name, build in (('dict per video', dict_store), ('__slots__ object', slots_store),
+                        ('VideoStates arrays', array_store)):
+        store, size = traced(build, ids)
+        print(f"  {name:20} {size / args.videos:8.1f}")
+        del store
+
+    info, info_size = traced(full_info, 'dQw4w9WgXcQ', 1)
+    flat, flat_size = traced(flat_entry, info)
+    print(f"Info dict kept per video: full {info_size / KIB:.1f} KiB, flat entry {flat_size} bytes")
+
+    if args.engine_videos:
+        for stream in (True, False):
+            peak, counts = engine_peak(args.engine_videos, stream)
+            mode = 'streaming' if stream else 'extract first'
+            print(f"Engine peak, {args.engine_videos} videos, {mode:13}: {peak:7.1f} MiB "
+                  f"({counts['done']} done, {counts['failed']} failed)")
+
+
+if __name__ == "__main__":
+    main()
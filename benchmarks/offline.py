@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and regression suite.
+Runs the download engine against a local HTTP server that stands in for the
+video site: a fake yt-dlp extractor lists synthetic playlists page by page and
+resolves each video to a synthetic media file. Each scenario runs in a fresh
+interpreter and reports time to first byte, throughput, listener events and
+coalesced UI updates per second, peak RSS and per-phase timings. Results are
+appended to a JSON Lines file, one record per scenario, so runs of different
+commits can be compared.
+
+Usage: python benchmarks/offline.py [--scenario small large] [--runs 3] [--output FILE]
+       python benchmarks/offline.py --compare [--threshold 10]
+"""
+
+import argparse
+import datetime
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+from playlist_downloader import DownloadEngine
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.jsonl')
+
+# Same refresh period as the GUI's ProgressBus
+UI_REFRESH_MS = 100
+
+KIB = 1024
+MIB = 1024 * 1024
+WRITE_SIZE = 64 * 1024
+
+# videos, KiB per video, entries per playlist page, parallel downloads,
+# seconds before each response, MiB/s per connection (0: unlimited)
+SCENARIOS = {
+    'small': {'videos': 20, 'size_kib': 4096, 'page_size': 20, 'workers': 3, 'latency': 0.02, 'rate': 0},
+    'large': {'videos': 1000, 'size_kib': 32, 'page_size': 100, 'workers': 4, 'latency': 0.005, 'rate': 0},
+    'throttled': {'videos': 12, 'size_kib': 8192, 'page_size': 50, 'workers': 3, 'latency': 0.05, 'rate': 4},
+}
+
+# Metric name -> whether a larger value is better (None: not checked for regressions)
+METRICS = {
+    'total_s': False,
+    'ttfb_s': False,
+    'first_video_s': False,
+    'throughput_mib_s': True,
+    'events_per_s': None,
+    'ui_updates_per_s': None,
+    'peak_rss_mib': False,
+}
+
+
+def video_title(config, video_id):
+    """Title of a video in the listing and its metadata; config['titles'] renames some."""
+    return config.get('titles', {}).get(video_id, f'Video {video_id}')
+
+
+class MediaServer(http.server.BaseHTTPRequestHandler):
+    """Synthetic site: playlist pages, video metadata and media files with Range support."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        url = urllib.parse.urlsplit(self.path)
+        time.sleep(config['latency'])
+        if url.path == '/api/playlist':
+            page = int(urllib.parse.parse_qs(url.query).get('page', ['0'])[0])
+            first = page * config['page_size']
+            # Videos added to the top of the playlist since it was first listed
+            video_ids = [f'new{index:05d}' for index in range(config.get('added', 0))]
+            video_ids += [f'v{index:05d}' for index in range(config['videos'])]
+            entries = [{'id': video_id, 'title': video_title(config, video_id),
+                        'duration': config.get('durations', {}).get(video_id, 60)}
+                       for video_id in video_ids[first:first + config['page_size']]]
+            self.send_json({'id': 'bench', 'title': 'Benchmark Playlist', 'entries': entries})
+        elif match := re.fullmatch(r'/api/video/([\w-]+)', url.path):
+            video_id = match.group(1)
+            self.send_json({'id': video_id, 'title': video_title(config, video_id), 'size': config['size_kib'] * KIB})
+        elif re.fullmatch(r'/media/[\w-]+\.mp4', url.path):
+            self.send_media(config['size_kib'] * KIB)
+        else:
+            self.send_error(404)
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, size):
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(end, int(match.group(2))) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        rate = self.server.config['rate'] * MIB
+        began = time.monotonic()
+        sent = 0
+        try:
+            while start + sent <= end:
+                count = min(WRITE_SIZE, end - start - sent + 1)
+                self.wfile.write(self.server.block[:count])
+                sent += count
+                if rate:
+                    delay = began + sent / rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        except OSError:
+            pass
+
+
+def serve(config):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MediaServer)
+    server.daemon_threads = True
+    server.config = config
+    server.block = os.urandom(WRITE_SIZE)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FakePlaylistIE(InfoExtractor):
+    """Lists /playlist/<id> of the local server one page at a time."""
+
+    IE_NAME = 'benchmark:playlist'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/playlist/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, playlist_id = self._match_valid_url(url).group('base', 'id')
+        first_page = self._download_json(f'{base}/api/playlist?page=0', playlist_id)
+        page_size = len(first_page['entries']) or 1
+
+        def fetch_page(page):
+            data = first_page if page == 0 else self._download_json(
+                f'{base}/api/playlist?page={page}', playlist_id, note=f'Downloading page {page}')
+            for entry in data['entries']:
+                yield self.url_result(f"{base}/watch/{entry['id']}", FakeVideoIE, entry['id'],
+                                      entry['title'], duration=entry['duration'])
+
+        return self.playlist_result(yt_dlp.utils.OnDemandPagedList(fetch_page, page_size),
+                                    playlist_id, first_page['title'])
+
+
+class FakeVideoIE(InfoExtractor):
+    """Resolves /watch/<id> of the local server to its synthetic media file."""
+
+    IE_NAME = 'benchmark:video'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/watch/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group('base', 'id')
+        data = self._download_json(f'{base}/api/video/{video_id}', video_id)
+        return {
+            'id': video_id,
+            'title': data['title'],
+            'formats': [{
+                'format_id': 'mp4',
+                'url': f'{base}/media/{video_id}.mp4',
+                'ext': 'mp4',
+                'filesize': data['size'],
+                'width': 1280,
+                'height': 720,
+                'vcodec': 'avc1',
+                'acodec': 'mp4a',
+            }],
+        }
+
+
+class BenchmarkEngine(DownloadEngine):
+    """DownloadEngine whose YoutubeDL instances try the fake extractors first."""
+
+    extractors = (FakeVideoIE, FakePlaylistIE)
+
+    def new_ydl(self, ydl_opts, stage=None):
+        ydl = super().new_ydl(ydl_opts, stage)
+        for ie in (extractor() for extractor in self.extractors):
+            ydl.add_info_extractor(ie)
+            # The generic extractor accepts any URL, so move ours in front of it
+            ydl._ies = {ie.ie_key(): ydl._ies.pop(ie.ie_key()), **ydl._ies}
+        return ydl
+
+
+class EventRecorder:
+    """Engine listener that timestamps milestones and counts coalesced UI updates.
+
+    Updates are keyed the way the GUI publishes them to its ProgressBus: one
+    key per video card plus the shared speed, size, status and progress bar.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.marks = {}
+        self.events = 0
+        self.pending = set()
+        self.ui_updates = 0
+        self.stop = threading.Event()
+        self.refresher = threading.Thread(target=self.refresh, daemon=True)
+        self.refresher.start()
+
+    def mark(self, name, last=False):
+        """Record the time of the first (or, with last, the latest) occurrence."""
+        if last or name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.start
+
+    def __call__(self, event, data):
+        with self.lock:
+            self.events += 1
+            video_id = data.get('video_id')
+            if event in ('extracting', 'playlist', 'started', 'listed'):
+                self.mark(event)
+                self.pending.add('status')
+            elif event == 'video':
+                self.mark('first_video')
+                self.pending.update((('video', video_id), 'video_count'))
+            elif event == 'downloading':
+                if data['downloaded_bytes']:
+                    self.mark('first_byte')
+                self.pending.update((('video', video_id), 'speed', 'total_size', 'status', 'bar'))
+            elif event == 'stats':
+                self.pending.update(('speed', 'total_size', 'status', 'bar'))
+            elif event in ('finished', 'done', 'failed', 'skipped', 'cancelled'):
+                self.mark(event, last=True)
+                self.pending.add(('video', video_id))
+
+    def refresh(self):
+        while not self.stop.wait(UI_REFRESH_MS / 1000):
+            with self.lock:
+                self.ui_updates += len(self.pending)
+                self.pending.clear()
+
+    def close(self):
+        self.stop.set()
+        self.refresher.join()
+        self.ui_updates += len(self.pending)
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process, or None where it is not available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / MIB if sys.platform == 'darwin' else peak / KIB
+
+
+def run_scenario(base_url, scenario):
+    """Download the benchmark playlist once in this process; returns the metrics."""
+    target = tempfile.mkdtemp(prefix='offline-bench-')
+    recorder = EventRecorder()
+    try:
+        with BenchmarkEngine(target, max_workers=scenario['workers'], listener=recorder) as engine:
+            engine.download(f'{base_url}/playlist/bench')
+        total = time.perf_counter() - recorder.start
+    finally:
+        recorder.close()
+        downloaded = sum(os.path.getsize(os.path.join(folder, name))
+                         for folder, _, names in os.walk(target) for name in names
+                         if name.endswith('.mp4'))
+        shutil.rmtree(target, ignore_errors=True)
+    marks = recorder.marks
+    first_byte = marks.get('first_byte', total)
+    last_file = marks.get('finished', total)
+    return {
+        'total_s': total,
+        'ttfb_s': first_byte,
+        'first_video_s': marks.get('first_video', total),
+        'throughput_mib_s': downloaded / MIB / max(last_file - first_byte, 1e-9),
+        'events_per_s': recorder.events / total,
+        'ui_updates_per_s': recorder.ui_updates / total,
+        'peak_rss_mib': peak_rss_mib(),
+        'downloaded_mib': downloaded / MIB,
+        'phases': {
+            'extract': marks.get('started', total),
+            'listing': marks.get('listed', total),
+            'download': last_file - first_byte,
+            'finish': total - last_file,
+        },
+    }
+
+
+def median_metrics(runs):
+    """Median of every metric over several runs."""
+    def median(values):
+        values = [value for value in values if value is not None]
+        return statistics.median(values) if values else None
+
+    merged = {name: median(run[name] for run in runs) for name in runs[0] if name != 'phases'}
+    merged['phases'] = {name: median(run['phases'][name] for run in runs) for name in runs[0]['phases']}
+    return merged
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    """Run each scenario in a fresh interpreter and append the results."""
+    for name in args.scenario:
+        scenario = SCENARIOS[name]
+        server = serve(scenario)
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        runs = []
+        try:
+            for _ in range(args.runs):
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child', base_url, '--scenario', name],
+                    capture_output=True, text=True)
+                if child.returncode:
+                    sys.exit(f"scenario {name} failed:\n{child.stderr}")
+                runs.append(json.loads(child.stdout.splitlines()[-1]))
+        finally:
+            server.shutdown()
+        record = {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'scenario': name,
+            'params': scenario,
+            'runs': args.runs,
+            'python': platform.python_version(),
+            'yt_dlp': yt_dlp.version.__version__,
+            'platform': platform.platform(),
+            'metrics': median_metrics(runs),
+        }
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        print_record(record)
+
+
+def print_record(record):
+    metrics = record['metrics']
+    print(f"{record['scenario']}: {record['params']['videos']} videos × {record['params']['size_kib']} KiB")
+    for name in METRICS:
+        value = metrics[name]
+        print(f"  {name:18} {'n/a' if value is None else f'{value:10.3f}'}")
+    phases = '  '.join(f"{name} {seconds:.3f}s" for name, seconds in metrics['phases'].items())
+    print(f"  phases             {phases}")
+
+
+def compare(args):
+    """Compare the latest record of each scenario with the one before it."""
+    try:
+        with open(args.output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        sys.exit(f"no results in {args.output}")
+    regressions = 0
+    for name in dict.fromkeys(record['scenario'] for record in records):
+        history = [record for record in records if record['scenario'] == name]
+        latest = history[-1]
+        # Only runs with the same parameters are comparable
+        previous = [record for record in history[:-1] if record['params'] == latest['params']]
+        if not previous:
+            print(f"{name}: no earlier run to compare with")
+            continue
+        baseline = previous[-1]
+        print(f"{name}: {baseline['commit']} ({baseline['time']}) -> {latest['commit']} ({latest['time']})")
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline['metrics'].get(metric), latest['metrics'].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = ''
+            if higher_is_better is not None and worse and abs(change) > args.threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"  {metric:18} {old:10.3f} -> {new:10.3f}  {change:+6.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=3, help="runs per scenario (medians are stored)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON Lines results file")
+    parser.add_argument('--compare', action='store_true',
+                        help="compare the latest results with the previous ones instead of running")
+    parser.add_argument('--threshold', type=float, default=10,
+                        help="percent change reported as a regression")
+    parser.add_argument('--child', metavar='URL', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, SCENARIOS[args.scenario[0]])))
+    elif args.compare:
+        sys.exit(compare(args))
+    else:
+        run_suite(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Progress hook storm benchmark.
+Floods the Tk main loop with synthetic yt-dlp progress ticks from several
+threads, once the old way (one root.after(0, ...) per widget update) and once
+through ProgressBus, then reports UI callbacks per second and main-loop latency.
+Needs a display (run under Xvfb on headless machines).
+
+Usage: python benchmarks/progress_storm.py [--threads 8] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myScript import PROGRESS_REFRESH_MS, ProgressBus, format_bytes
+
+HEARTBEAT_MS = 10
+
+
+def run_storm(mode, threads, seconds):
+    """Run one storm and return its measurements."""
+    root = tk.Tk()
+    root.withdraw()
+    labels = {name: tk.Label(root) for name in ('speed', 'total', 'status')}
+    cards = [tk.Label(root) for _ in range(threads)]
+    bus = ProgressBus()
+    stop = threading.Event()
+    callbacks = [0]
+    ticks = [0] * threads
+    latencies = []
+
+    def configure(widget, text):
+        callbacks[0] += 1
+        widget.configure(text=text)
+
+    def hook_storm(worker):
+        # One progress hook call publishes the same four updates as progress_hook
+        downloaded = 0
+        while not stop.is_set():
+            downloaded += 16384
+            text = format_bytes(downloaded)
+            updates = (
+                ('speed', labels['speed'], f"Speed: {worker} MB/s"),
+                ('total_size', labels['total'], f"Downloaded: {text}"),
+                ('status', labels['status'], f"⬇ Downloading... {text}"),
+                (('video', worker), cards[worker], text),
+            )
+            for key, widget, value in updates:
+                if mode == 'bus':
+                    bus.publish(key, configure, widget, value)
+                    continue
+                try:
+                    root.after(0, configure, widget, value)
+                except RuntimeError:
+                    # The main loop already exited
+                    return
+            ticks[worker] += 1
+            time.sleep(0)
+
+    def refresh():
+        bus.apply()
+        if not stop.is_set():
+            root.after(PROGRESS_REFRESH_MS, refresh)
+
+    def heartbeat(expected):
+        now = time.perf_counter()
+        latencies.append(max(0.0, now - expected))
+        if not stop.is_set():
+            root.after(HEARTBEAT_MS, heartbeat, now + HEARTBEAT_MS / 1000)
+
+    def finish():
+        stop.set()
+        # Let the backlog drain so it is counted, then leave the main loop
+        root.after(PROGRESS_REFRESH_MS, root.quit)
+
+    workers = [threading.Thread(target=hook_storm, args=(i,), daemon=True) for i in range(threads)]
+    start = time.perf_counter()
+    if mode == 'bus':
+        root.after(PROGRESS_REFRESH_MS, refresh)
+    root.after(HEARTBEAT_MS, heartbeat, start + HEARTBEAT_MS / 1000)
+    root.after(int(seconds * 1000), finish)
+    for worker in workers:
+        worker.start()
+    root.mainloop()
+    elapsed = time.perf_counter() - start
+    for worker in workers:
+        worker.join()
+    bus.apply()
+    root.destroy()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'hook_calls_per_s': sum(ticks) / seconds,
+        'ui_callbacks_per_s': callbacks[0] / elapsed,
+        'latency_mean_ms': 1000 * sum(latencies) / max(1, len(latencies)),
+        'latency_p99_ms': 1000 * latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'latency_max_ms': 1000 * latencies[-1] if latencies else 0.0,
+        'drain_overrun_s': max(0.0, elapsed - seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help="concurrent hook threads")
+    parser.add_argument('--seconds', type=float, default=5.0, help="storm duration per mode")
+    args = parser.parse_args()
+
+    for mode in ('after', 'bus'):
+        result = run_storm(mode, args.threads, args.seconds)
+        print(f"{result['mode']:>5}: "
+              f"{result['hook_calls_per_s']:10.0f} hook calls/s  "
+              f"{result['ui_callbacks_per_s']:10.0f} UI callbacks/s  "
+              f"latency mean {result['latency_mean_ms']:7.1f} ms  "
+              f"p99 {result['latency_p99_ms']:7.1f} ms  "
+              f"max {result['latency_max_ms']:7.1f} ms  "
+              f"overrun {result['drain_overrun_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark.
+Starts the GUI in a fresh interpreter several times and reports the time from
+process launch to the first painted window, and to the download engine being
+loaded in the background. Needs a display (run under Xvfb on headless machines).
+
+Usage: python benchmarks/startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter: report each milestone on stdout
+CHILD = '''
+import sys, time
+sys.path.insert(0, {root!r})
+import myScript
+app = myScript.YouTubeDownloaderGUI()
+app.root.update()
+print("window", time.time(), flush=True)
+def wait_engine():
+    if app.engine_ready.is_set():
+        print("engine", time.time(), flush=True)
+        app.root.destroy()
+    else:
+        app.root.after(5, wait_engine)
+app.root.after(0, wait_engine)
+app.run()
+'''
+
+
+def measure_once():
+    """Return (seconds to first window, seconds to engine loaded) for one launch."""
+    start = time.time()
+    child = subprocess.Popen([sys.executable, '-c', CHILD.format(root=ROOT)],
+                             stdout=subprocess.PIPE, text=True)
+    milestones = {}
+    for line in child.stdout:
+        name, stamp = line.split()
+        milestones[name] = float(stamp) - start
+    child.wait()
+    return milestones['window'], milestones['engine']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="number of launches")
+    args = parser.parse_args()
+
+    windows, engines = [], []
+    for _ in range(args.runs):
+        window, engine = measure_once()
+        windows.append(window)
+        engines.append(engine)
+
+    print(f"time to first window: median {1000 * statistics.median(windows):7.1f} ms  "
+          f"min {1000 * min(windows):7.1f} ms")
+    print(f"time to engine ready: median {1000 * statistics.median(engines):7.1f} ms  "
+          f"min {1000 * min(engines):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,12 @@ Requires: pip install yt-dlp customtkinter pillow requests
 import os
 import sys
 import threading
+import time
 from pathlib import Path
 from tkinter import filedialog
 import customtkinter as ctk
-from urllib.request import urlopen
-from io import BytesIO
+
+from thumbnails import THUMBNAIL_SIZE, ThumbnailCache
 
 # Get the directory where the executable is located
 if getattr(sys, 'frozen', False):
@@ -20,23 +21,441 @@ if getattr(sys, 'frozen', False):
 else:
     application_path = os.path.dirname(os.path.abspath(__file__))
 
-# Add ffmpeg to PATH if it exists in the app directory
-ffmpeg_path = os.path.join(application_path, 'ffmpeg.exe')
-if os.path.exists(ffmpeg_path):
-    os.environ["PATH"] = application_path + os.pathsep + os.environ["PATH"]
+# Set by load_engine(), which runs in the background once the window is up
+DownloadEngine = None
+JobQueue = None
+run_queue = None
+default_queue_path = None
+default_library_path = None
+RateSchedule = None
+
+# How often queued progress updates are applied to the widgets
+PROGRESS_REFRESH_MS = 100
+
+# Delay before the download engine is loaded, so the first window paints first
+ENGINE_WARMUP_DELAY_MS = 50
+
+# Upper bound of parallel downloads when "Auto" is selected
+ADAPTIVE_MAX_WORKERS = 8
+
+# Download order choices and the engine's scheduling modes
+DOWNLOAD_ORDERS = {"Playlist": "playlist", "Smallest first": "smallest", "Balanced": "balanced"}
+
+# Video list geometry: card height, row pitch and spare pooled cards
+VIDEO_CARD_HEIGHT = 110
+VIDEO_ROW_HEIGHT = 120
+VIDEO_ROW_BUFFER = 2
+
+
+def load_engine():
+    """Import the download engine (and yt-dlp) and put a bundled ffmpeg on PATH."""
+    global DownloadEngine, JobQueue, run_queue, default_queue_path, default_library_path, RateSchedule
+    
+    # Add ffmpeg to PATH if it exists in the app directory
+    ffmpeg_path = os.path.join(application_path, 'ffmpeg.exe')
+    if os.path.exists(ffmpeg_path):
+        os.environ["PATH"] = application_path + os.pathsep + os.environ["PATH"]
+    
+    from playlist_downloader import bandwidth, engine, jobs, library
+    DownloadEngine = engine.DownloadEngine
+    JobQueue, run_queue, default_queue_path = jobs.JobQueue, jobs.run_queue, jobs.default_queue_path
+    default_library_path = library.default_library_path
+    RateSchedule = bandwidth.RateSchedule
+
+
+def format_duration(seconds):
+    """Format an ETA for display."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def format_bytes(bytes_num):
+    """Format a byte count for display."""
+    if bytes_num == 0:
+        return "0 B"
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_num < 1024.0:
+            return f"{bytes_num:.1f} {unit}"
+        bytes_num /= 1024.0
+    return f"{bytes_num:.1f} TB"
+
+
+class ProgressBus:
+    """Latest-value store between download threads and the Tk main loop.
+    
+    Threads publish UI updates under a key; only the newest update per key is
+    kept, and the main loop applies whatever changed on its next refresh.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+    
+    def publish(self, key, func, *args):
+        """Queue func(*args), replacing any update not yet applied for key."""
+        with self._lock:
+            self._pending[key] = (func, args)
+    
+    def drain(self):
+        """Return and clear the pending updates."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+    
+    def apply(self):
+        """Run the pending updates; returns how many were applied."""
+        pending = self.drain()
+        for func, args in pending.values():
+            func(*args)
+        return len(pending)
+
+
+class VideoState:
+    """Display state of one playlist entry."""
+    
+    __slots__ = ('video_id', 'title', 'index', 'thumbnail_url',
+                 'status', 'progress', 'color', 'download_info')
+    
+    def __init__(self, video_id, title, index, thumbnail_url=None):
+        self.video_id = video_id
+        self.title = title
+        self.index = index
+        self.thumbnail_url = thumbnail_url
+        self.status = "⏳ Waiting"
+        self.progress = 0.0
+        self.color = None
+        self.download_info = ""
+
+
+class VideoStore:
+    """Per-video state in list order; only touched from the Tk main loop."""
+    
+    def __init__(self):
+        self.videos = []
+        self.rows = {}
+    
+    def add(self, video_id, title, index, thumbnail_url=None):
+        """Append a video and return its row (existing videos keep theirs)."""
+        if video_id not in self.rows:
+            self.rows[video_id] = len(self.videos)
+            self.videos.append(VideoState(video_id, title, index, thumbnail_url))
+        return self.rows[video_id]
+    
+    def get(self, video_id):
+        """Return the state of a video, or None if it is not in the list."""
+        row = self.rows.get(video_id)
+        return self.videos[row] if row is not None else None
+    
+    def row_of(self, video_id):
+        """Return the row of a video, or None."""
+        return self.rows.get(video_id)
+    
+    def __len__(self):
+        return len(self.videos)
+    
+    def __getitem__(self, row):
+        return self.videos[row]
+
+
+class VirtualVideoList(ctk.CTkFrame):
+    """Scrollable video list that only builds cards for the visible rows.
+    
+    A small pool of cards is placed over the rows in view and rebound to other
+    videos while scrolling, so the widget count does not grow with the playlist.
+    """
+    
+    def __init__(self, master, store, colors, thumbnails=None, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.store = store
+        self.colors = colors
+        self.thumbnails = thumbnails
+        self.top = 0
+        self.cards = []
+        self.visible = {}
+        self.redraw_pending = False
+        
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y", padx=(8, 0))
+        
+        self.viewport.bind("<Configure>", lambda event: self.redraw())
+    
+    def build_card(self):
+        """Create one reusable video card (not placed yet)."""
+        video_card = ctk.CTkFrame(
+            self.viewport,
+            fg_color=self.colors['bg_card'],
+            corner_radius=12,
+            height=VIDEO_CARD_HEIGHT
+        )
+        video_card.pack_propagate(False)
+        
+        card_content = ctk.CTkFrame(video_card, fg_color="transparent")
+        card_content.pack(fill="both", expand=True, padx=15, pady=12)
+        
+        # Thumbnail placeholder
+        thumbnail_frame = ctk.CTkFrame(
+            card_content,
+            width=THUMBNAIL_SIZE[0],
+            height=THUMBNAIL_SIZE[1],
+            fg_color=self.colors['bg_primary'],
+            corner_radius=8
+        )
+        thumbnail_frame.pack(side="left", padx=(0, 15))
+        thumbnail_frame.pack_propagate(False)
+        
+        # Thumbnail image, shown once loaded
+        image_label = ctk.CTkLabel(thumbnail_frame, text="")
+        
+        # Index on thumbnail
+        index_label = ctk.CTkLabel(
+            thumbnail_frame,
+            text="",
+            font=ctk.CTkFont(size=24, weight="bold"),
+            text_color=self.colors['accent_cyan']
+        )
+        index_label.place(relx=0.5, rely=0.5, anchor="center")
+        
+        # Info container
+        info_container = ctk.CTkFrame(card_content, fg_color="transparent")
+        info_container.pack(side="left", fill="both", expand=True)
+        
+        # Title
+        title_label = ctk.CTkLabel(
+            info_container,
+            text="",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=self.colors['text_primary'],
+            anchor="w",
+            wraplength=600
+        )
+        title_label.pack(anchor="w")
+        
+        # Download info
+        download_info_label = ctk.CTkLabel(
+            info_container,
+            text="",
+            font=ctk.CTkFont(size=10),
+            text_color=self.colors['text_secondary'],
+            anchor="w"
+        )
+        download_info_label.pack(anchor="w", pady=(3, 0))
+        
+        # Progress bar
+        progress_container = ctk.CTkFrame(info_container, fg_color="transparent")
+        progress_container.pack(fill="x", pady=(8, 0))
+        
+        progress_bar = ctk.CTkProgressBar(
+            progress_container,
+            height=6,
+            corner_radius=3,
+            progress_color=self.colors['accent_cyan'],
+            fg_color=self.colors['bg_primary']
+        )
+        progress_bar.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        progress_bar.set(0)
+        
+        # Status
+        status_label = ctk.CTkLabel(
+            progress_container,
+            text="",
+            font=ctk.CTkFont(size=10, weight="bold"),
+            text_color=self.colors['text_secondary'],
+            width=100
+        )
+        status_label.pack(side="right")
+        
+        return {
+            'card': video_card,
+            'thumbnail': thumbnail_frame,
+            'image_label': image_label,
+            'image_id': None,
+            'index_label': index_label,
+            'title': title_label,
+            'status': status_label,
+            'progress': progress_bar,
+            'download_info': download_info_label,
+            'video_id': None
+        }
+    
+    def bind_card(self, card, video):
+        """Show a video's state on a pooled card."""
+        if card['video_id'] != video.video_id:
+            card['video_id'] = video.video_id
+            title = video.title
+            card['index_label'].configure(text=str(video.index))
+            card['title'].configure(text=title[:80] + "..." if len(title) > 80 else title)
+        self.bind_thumbnail(card, video)
+        card['status'].configure(text=video.status,
+                                 text_color=video.color or self.colors['text_secondary'])
+        card['progress'].set(video.progress)
+        card['progress'].configure(
+            progress_color=self.colors['success'] if video.progress >= 1.0 else self.colors['accent_cyan']
+        )
+        card['download_info'].configure(text=video.download_info)
+    
+    def bind_thumbnail(self, card, video):
+        """Show a video's thumbnail on its card, loading it if needed."""
+        if card['image_id'] == video.video_id:
+            return
+        image = self.thumbnails.get(video.video_id) if self.thumbnails else None
+        if image is None:
+            card['image_id'] = None
+            card['image_label'].place_forget()
+            card['index_label'].place(relx=0.5, rely=0.5, anchor="center")
+            if self.thumbnails and video.thumbnail_url:
+                self.thumbnails.request(video.video_id, video.thumbnail_url,
+                                        self.thumbnail_loaded, still_wanted=self.is_visible)
+            return
+        card['image_id'] = video.video_id
+        card['image_label'].configure(image=ctk.CTkImage(image, size=THUMBNAIL_SIZE))
+        card['image_label'].place(x=0, y=0, relwidth=1.0, relheight=1.0)
+        card['index_label'].place_forget()
+    
+    def thumbnail_loaded(self, video_id):
+        """ThumbnailCache callback (worker thread): show the image if in view."""
+        try:
+            self.after(0, self.refresh_video, video_id)
+        except RuntimeError:
+            # The main loop already exited
+            pass
+    
+    def is_visible(self, video_id):
+        """Whether a video's row is on screen (read from worker threads)."""
+        return self.store.row_of(video_id) in self.visible
+    
+    def set_store(self, store):
+        """Show another list of videos, scrolled to the top."""
+        self.store = store
+        self.top = 0
+        self.redraw()
+    
+    def schedule_redraw(self):
+        """Redraw once the main loop is idle (coalesces bursts of added rows)."""
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self.redraw)
+    
+    def redraw(self):
+        """Place and bind cards for the rows currently in view."""
+        self.redraw_pending = False
+        height = self.viewport.winfo_height()
+        total = len(self.store) * VIDEO_ROW_HEIGHT
+        self.top = max(0, min(self.top, total - height))
+        
+        first = self.top // VIDEO_ROW_HEIGHT
+        last = min(len(self.store), (self.top + height) // VIDEO_ROW_HEIGHT + 1)
+        while len(self.cards) < last - first + VIDEO_ROW_BUFFER:
+            self.cards.append(self.build_card())
+        
+        # Rows keep the same card while they stay in view, so scrolling by one
+        # row rebinds a single card instead of all of them.
+        visible = {}
+        for row in range(first, last):
+            card = self.cards[row % len(self.cards)]
+            if self.visible.get(row) is not card or card['video_id'] != self.store[row].video_id:
+                self.bind_card(card, self.store[row])
+            card['card'].place(x=0, y=row * VIDEO_ROW_HEIGHT - self.top, relwidth=1.0)
+            visible[row] = card
+        placed = set(map(id, visible.values()))
+        for card in self.cards:
+            if id(card) not in placed:
+                card['card'].place_forget()
+        self.visible = visible
+        
+        if total > height:
+            self.scrollbar.set(self.top / total, (self.top + height) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def refresh_video(self, video_id):
+        """Rebind the card of a video if it is in view."""
+        row = self.store.row_of(video_id)
+        card = self.visible.get(row)
+        if card is not None:
+            self.bind_card(card, self.store[row])
+    
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, what)."""
+        height = self.viewport.winfo_height()
+        total = len(self.store) * VIDEO_ROW_HEIGHT
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = height if args[2] == 'pages' else VIDEO_ROW_HEIGHT // 2
+            self.top += int(float(args[1]) * step)
+        self.redraw()
+    
+    def on_mousewheel(self, event):
+        """Scroll when the wheel is used over the list (the app forwards every wheel event)."""
+        if not self.winfo_exists() or not str(event.widget).startswith(str(self)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.yview('scroll', -1, 'units')
+        elif event.num == 5 or event.delta < 0:
+            self.yview('scroll', 1, 'units')
 
-try:
-    import yt_dlp
-except ImportError:
-    print("Error: yt-dlp is not installed.")
-    print("Please install it using: pip install yt-dlp")
-    sys.exit(1)
 
-try:
-    from PIL import Image, ImageTk
-except ImportError:
-    Image = None
-    ImageTk = None
+class QueuePanel(ctk.CTkScrollableFrame):
+    """Download jobs with buttons to reorder, prioritise, retry and remove them."""
+    
+    STATUS_ICONS = {'running': "⬇", 'queued': "⏳", 'failed': "❌", 'cancelled': "✕"}
+    
+    def __init__(self, master, colors, on_move, on_priority, on_retry, on_remove, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.colors = colors
+        self.on_move = on_move
+        self.on_priority = on_priority
+        self.on_retry = on_retry
+        self.on_remove = on_remove
+        self.rows = []
+    
+    def show(self, jobs):
+        """Rebuild the rows (job queues are short, unlike video lists)."""
+        for row in self.rows:
+            row.destroy()
+        self.rows = []
+        for job in jobs:
+            row = ctk.CTkFrame(self, fg_color=self.colors['bg_card'], corner_radius=8)
+            row.pack(fill="x", pady=(0, 6))
+            
+            name = job.title or job.url
+            star = "★ " if job.priority > 0 else ""
+            label = ctk.CTkLabel(
+                row,
+                text=f"{self.STATUS_ICONS[job.status]} {star}{name[:38]}",
+                font=ctk.CTkFont(size=11, weight="bold" if job.status == 'running' else "normal"),
+                text_color=self.colors['error'] if job.status == 'failed' else self.colors['text_primary'],
+                anchor="w"
+            )
+            label.pack(side="left", fill="x", expand=True, padx=(10, 4), pady=6)
+            
+            if job.status == 'queued':
+                buttons = [("✕", self.on_remove), ("★", self.on_priority),
+                           ("▼", lambda job_id: self.on_move(job_id, 1)),
+                           ("▲", lambda job_id: self.on_move(job_id, -1))]
+            elif job.status in ('failed', 'cancelled'):
+                buttons = [("✕", self.on_remove), ("↻", self.on_retry)]
+            else:
+                buttons = []
+            for text, command in buttons:
+                ctk.CTkButton(
+                    row,
+                    text=text,
+                    width=26,
+                    height=26,
+                    font=ctk.CTkFont(size=12),
+                    fg_color=self.colors['bg_primary'],
+                    hover_color=self.colors['accent_blue'],
+                    corner_radius=6,
+                    command=lambda command=command, job_id=job.job_id: command(job_id)
+                ).pack(side="right", padx=(0, 4))
+            self.rows.append(row)
 
 
 class YouTubeDownloaderGUI:
@@ -46,7 +465,7 @@ class YouTubeDownloaderGUI:
         
         self.root = ctk.CTk()
         self.root.title("YouTube Playlist Downloader")
-        self.root.geometry("550x650")
+        self.root.geometry("550x820")
         
         self.colors = {
             'bg_primary': '#0A0E1A',
@@ -66,15 +485,60 @@ class YouTubeDownloaderGUI:
         
         self.is_downloading = False
         self.output_dir = str(Path.home() / "Downloads" / "YouTube")
-        self.video_frames = {}
-        self.current_video = None
+        self.videos = VideoStore()
         self.download_quality = "highest"
-        self.thumbnail_cache = {}
+        self.max_workers = 3
+        self.adaptive_workers = False
+        self.stream_playlist = True
+        self.sync_playlist = False
+        self.download_order = "playlist"
+        self.rate_limit_text = ""
+        self.rate_limit = None
+        self.staging_dir = ""
+        self.thumbnails = ThumbnailCache()
+        self.progress_bus = ProgressBus()
+        self.video_count = 0
         self.total_downloaded = 0
         self.current_speed = "0 MB/s"
+        self.engine_ready = threading.Event()
+        self.engine_error = None
+        self.engine = None
+        self.download_session = 0
+        self.job_queue = None
+        self.current_job = None
+        self.last_failed = None
         
         self.setup_compact_view()
-        
+        # Diagnostics: F8 saves timings and counters, F9 starts/stops profiling
+        self.root.bind("<F8>", lambda event: self.export_metrics())
+        self.root.bind("<F9>", lambda event: self.toggle_profiling())
+        # Bound once for the app: the video list is rebuilt with every download view
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.root.bind_all(sequence, self.on_mousewheel, add="+")
+        self.root.after(ENGINE_WARMUP_DELAY_MS, self.start_engine_warmup)
+    
+    def on_mousewheel(self, event):
+        """Scroll the video list when the wheel is used over it."""
+        if hasattr(self, 'video_list'):
+            self.video_list.on_mousewheel(event)
+    
+    def start_engine_warmup(self):
+        """Load yt-dlp in the background while the user pastes a URL."""
+        threading.Thread(target=self.warm_up_engine, daemon=True).start()
+    
+    def warm_up_engine(self):
+        """Background part of start_engine_warmup."""
+        try:
+            load_engine()
+            self.job_queue = JobQueue(default_queue_path())
+            self.root.after(0, self.refresh_queue_panel)
+        except ImportError as e:
+            self.engine_error = e
+            print("Error: yt-dlp is not installed.")
+            print("Please install it using: pip install yt-dlp")
+        finally:
+            self.engine_ready.set()
+    
     def setup_compact_view(self):
         """Compact input view for starting downloads."""
         self.compact_frame = ctk.CTkFrame(self.root, fg_color="transparent")
@@ -117,7 +581,7 @@ class YouTubeDownloaderGUI:
         
         url_label = ctk.CTkLabel(
             url_frame,
-            text="📎 Playlist URL",
+            text="📎 Playlist URLs",
             font=ctk.CTkFont(size=12, weight="bold"),
             text_color=self.colors['text_primary']
         )
@@ -128,7 +592,7 @@ class YouTubeDownloaderGUI:
         
         self.url_entry = ctk.CTkEntry(
             url_input_container,
-            placeholder_text="Paste YouTube playlist URL here...",
+            placeholder_text="Paste one or more playlist / video URLs here...",
             height=45,
             font=ctk.CTkFont(size=12),
             fg_color=self.colors['bg_card'],
@@ -193,7 +657,7 @@ class YouTubeDownloaderGUI:
         
         # Quality selector
         quality_frame = ctk.CTkFrame(self.compact_frame, fg_color=self.colors['bg_secondary'], corner_radius=12)
-        quality_frame.pack(fill="x", pady=(0, 20))
+        quality_frame.pack(fill="x", pady=(0, 12))
         
         quality_content = ctk.CTkFrame(quality_frame, fg_color="transparent")
         quality_content.pack(fill="x", padx=20, pady=15)
@@ -218,6 +682,129 @@ class YouTubeDownloaderGUI:
         self.quality_selector.pack(side="right")
         self.quality_selector.set("Highest")
         
+        # Parallel downloads selector
+        workers_frame = ctk.CTkFrame(self.compact_frame, fg_color=self.colors['bg_secondary'], corner_radius=12)
+        workers_frame.pack(fill="x", pady=(0, 20))
+        
+        workers_content = ctk.CTkFrame(workers_frame, fg_color="transparent")
+        workers_content.pack(fill="x", padx=20, pady=15)
+        
+        workers_label = ctk.CTkLabel(
+            workers_content,
+            text="⚡ Parallel Downloads",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=self.colors['text_primary']
+        )
+        workers_label.pack(side="left")
+        
+        self.workers_selector = ctk.CTkSegmentedButton(
+            workers_content,
+            values=["1", "2", "3", "4", "6", "8", "Auto"],
+            command=self.workers_changed,
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            selected_color=self.colors['accent_cyan'],
+            selected_hover_color=self.colors['accent_blue']
+        )
+        self.workers_selector.pack(side="right")
+        self.workers_selector.set("Auto" if self.adaptive_workers else str(self.max_workers))
+        
+        order_content = ctk.CTkFrame(workers_frame, fg_color="transparent")
+        order_content.pack(fill="x", padx=20, pady=(0, 15))
+        
+        order_label = ctk.CTkLabel(
+            order_content,
+            text="🗂 Order",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=self.colors['text_primary']
+        )
+        order_label.pack(side="left")
+        
+        self.order_selector = ctk.CTkSegmentedButton(
+            order_content,
+            values=list(DOWNLOAD_ORDERS),
+            command=self.order_changed,
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            selected_color=self.colors['accent_cyan'],
+            selected_hover_color=self.colors['accent_blue']
+        )
+        self.order_selector.pack(side="right")
+        self.order_selector.set(next(label for label, mode in DOWNLOAD_ORDERS.items()
+                                     if mode == self.download_order))
+        
+        limit_content = ctk.CTkFrame(workers_frame, fg_color="transparent")
+        limit_content.pack(fill="x", padx=20, pady=(0, 15))
+        
+        limit_label = ctk.CTkLabel(
+            limit_content,
+            text="🚦 Speed Limit",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=self.colors['text_primary']
+        )
+        limit_label.pack(side="left")
+        
+        self.limit_entry = ctk.CTkEntry(
+            limit_content,
+            width=300,
+            placeholder_text="Unlimited, 20M, or mon-fri 09:00-18:00=20M",
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            border_width=0
+        )
+        self.limit_entry.pack(side="right")
+        self.limit_entry.bind("<Return>", lambda event: self.rate_limit_changed(self.limit_entry))
+        self.limit_entry.bind("<FocusOut>", lambda event: self.rate_limit_changed(self.limit_entry))
+        
+        staging_content = ctk.CTkFrame(workers_frame, fg_color="transparent")
+        staging_content.pack(fill="x", padx=20, pady=(0, 15))
+        
+        staging_label = ctk.CTkLabel(
+            staging_content,
+            text="💾 Staging Folder",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            text_color=self.colors['text_primary']
+        )
+        staging_label.pack(side="left")
+        
+        # For a save location on a slow drive: downloads and merges run on a
+        # fast local folder and finished files are moved over in the background
+        self.staging_entry = ctk.CTkEntry(
+            staging_content,
+            width=300,
+            placeholder_text="None, or a fast local folder",
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            border_width=0
+        )
+        self.staging_entry.pack(side="right")
+        if self.staging_dir:
+            self.staging_entry.insert(0, self.staging_dir)
+        
+        self.stream_switch = ctk.CTkSwitch(
+            workers_frame,
+            text="Start downloading while the playlist is still loading",
+            font=ctk.CTkFont(size=11),
+            text_color=self.colors['text_secondary'],
+            progress_color=self.colors['accent_cyan'],
+            command=self.stream_changed
+        )
+        self.stream_switch.pack(anchor="w", padx=20, pady=(0, 8))
+        if self.stream_playlist:
+            self.stream_switch.select()
+        
+        self.sync_switch = ctk.CTkSwitch(
+            workers_frame,
+            text="Sync: only fetch videos that are new since the last run",
+            font=ctk.CTkFont(size=11),
+            text_color=self.colors['text_secondary'],
+            progress_color=self.colors['accent_cyan'],
+            command=self.sync_changed
+        )
+        self.sync_switch.pack(anchor="w", padx=20, pady=(0, 15))
+        if self.sync_playlist:
+            self.sync_switch.select()
+        
         # Download Button
         self.download_btn = ctk.CTkButton(
             self.compact_frame,
@@ -230,6 +817,7 @@ class YouTubeDownloaderGUI:
             command=self.start_download
         )
         self.download_btn.pack(fill="x")
+        self.refresh_queue_panel()
     
     def setup_download_view(self):
         """Expanded view showing download progress."""
@@ -289,12 +877,57 @@ class YouTubeDownloaderGUI:
             font=ctk.CTkFont(size=11),
             text_color=self.colors['accent_cyan']
         )
-        self.speed_label.pack(side="left")
+        self.speed_label.pack(side="left", padx=(0, 15))
+        
+        # Decisions of the adaptive concurrency controller ("Auto" only)
+        self.concurrency_label = ctk.CTkLabel(
+            stats_container,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color=self.colors['accent_purple']
+        )
+        self.concurrency_label.pack(side="left", padx=(0, 15))
+        
+        self.queue_label = ctk.CTkLabel(
+            stats_container,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color=self.colors['text_secondary']
+        )
+        self.queue_label.pack(side="left")
         
         # Right side - Actions
         right_actions = ctk.CTkFrame(control_content, fg_color="transparent")
         right_actions.pack(side="right")
         
+        # Shown once a download has ended with failed videos
+        self.retry_btn = ctk.CTkButton(
+            right_actions,
+            text="↻ Retry failed",
+            height=45,
+            font=ctk.CTkFont(size=13, weight="bold"),
+            fg_color=self.colors['accent_purple'],
+            hover_color=self.colors['accent_blue'],
+            corner_radius=10,
+            command=self.retry_failed_videos
+        )
+        
+        # Speed limit of the running downloads, applied on Enter or when leaving the field
+        self.live_limit_entry = ctk.CTkEntry(
+            right_actions,
+            width=170,
+            height=45,
+            placeholder_text="🚦 Speed limit",
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            border_width=0
+        )
+        self.live_limit_entry.pack(side="left", padx=(0, 8))
+        if self.rate_limit_text:
+            self.live_limit_entry.insert(0, self.rate_limit_text)
+        self.live_limit_entry.bind("<Return>", lambda event: self.rate_limit_changed(self.live_limit_entry))
+        self.live_limit_entry.bind("<FocusOut>", lambda event: self.rate_limit_changed(self.live_limit_entry))
+        
         self.pause_btn = ctk.CTkButton(
             right_actions,
             text="⏸",
@@ -304,7 +937,7 @@ class YouTubeDownloaderGUI:
             fg_color=self.colors['warning'],
             hover_color="#D97706",
             corner_radius=10,
-            state="disabled"
+            command=self.toggle_pause
         )
         self.pause_btn.pack(side="left", padx=(0, 8))
         
@@ -357,9 +990,65 @@ class YouTubeDownloaderGUI:
         self.progress_bar.pack(fill="x")
         self.progress_bar.set(0)
         
+        main_area = ctk.CTkFrame(self.download_frame, fg_color="transparent")
+        main_area.pack(fill="both", expand=True)
+        
+        # Job queue
+        queue_section = ctk.CTkFrame(main_area, fg_color=self.colors['bg_secondary'], corner_radius=15, width=330)
+        queue_section.pack(side="right", fill="y", padx=(15, 0))
+        queue_section.pack_propagate(False)
+        
+        queue_title = ctk.CTkLabel(
+            queue_section,
+            text="📋 Queue",
+            font=ctk.CTkFont(size=14, weight="bold"),
+            text_color=self.colors['text_primary']
+        )
+        queue_title.pack(anchor="w", padx=20, pady=(15, 10))
+        
+        add_container = ctk.CTkFrame(queue_section, fg_color="transparent")
+        add_container.pack(fill="x", padx=20, pady=(0, 10))
+        
+        self.queue_entry = ctk.CTkEntry(
+            add_container,
+            placeholder_text="Add playlist / video URL...",
+            height=34,
+            font=ctk.CTkFont(size=11),
+            fg_color=self.colors['bg_card'],
+            border_color=self.colors['accent_cyan'],
+            border_width=1,
+            corner_radius=8
+        )
+        self.queue_entry.pack(side="left", fill="x", expand=True, padx=(0, 6))
+        self.queue_entry.bind("<Return>", lambda event: self.add_to_queue())
+        
+        add_btn = ctk.CTkButton(
+            add_container,
+            text="➕",
+            width=34,
+            height=34,
+            font=ctk.CTkFont(size=14),
+            fg_color=self.colors['accent_cyan'],
+            hover_color=self.colors['accent_blue'],
+            corner_radius=8,
+            command=self.add_to_queue
+        )
+        add_btn.pack(side="right")
+        
+        self.queue_panel = QueuePanel(
+            queue_section,
+            self.colors,
+            on_move=self.move_job,
+            on_priority=self.toggle_job_priority,
+            on_retry=self.retry_job,
+            on_remove=self.remove_job
+        )
+        self.queue_panel.pack(fill="both", expand=True, padx=(20, 10), pady=(0, 15))
+        self.refresh_queue_panel()
+        
         # Video list
-        list_section = ctk.CTkFrame(self.download_frame, fg_color=self.colors['bg_secondary'], corner_radius=15)
-        list_section.pack(fill="both", expand=True)
+        list_section = ctk.CTkFrame(main_area, fg_color=self.colors['bg_secondary'], corner_radius=15)
+        list_section.pack(side="left", fill="both", expand=True)
         
         list_header = ctk.CTkFrame(list_section, fg_color="transparent")
         list_header.pack(fill="x", padx=25, pady=(15, 10))
@@ -372,11 +1061,52 @@ class YouTubeDownloaderGUI:
         )
         list_title.pack(side="left")
         
-        self.video_list_scroll = ctk.CTkScrollableFrame(
-            list_section,
-            fg_color="transparent"
-        )
-        self.video_list_scroll.pack(fill="both", expand=True, padx=25, pady=(0, 20))
+        self.videos = VideoStore()
+        self.video_list = VirtualVideoList(list_section, self.videos, self.colors,
+                                           thumbnails=self.thumbnails)
+        self.video_list.pack(fill="both", expand=True, padx=25, pady=(0, 20))
+    
+    def refresh_queue_panel(self):
+        """Show the current jobs in the queue panel and on the download button."""
+        if self.job_queue is None:
+            return
+        jobs = self.job_queue.jobs()
+        if hasattr(self, 'queue_panel') and self.queue_panel.winfo_exists():
+            self.queue_panel.show(jobs)
+        queued = sum(job.status == 'queued' for job in jobs)
+        if self.download_btn.winfo_exists():
+            self.download_btn.configure(
+                text=f"⬇ Start Download ({queued} queued)" if queued else "⬇ Start Download")
+    
+    def add_to_queue(self):
+        """Queue the URLs typed in the download view; start them if idle."""
+        urls = self.queue_entry.get().split()
+        if not urls or self.job_queue is None:
+            return
+        self.queue_entry.delete(0, "end")
+        for url in urls:
+            self.job_queue.add(url, self.output_dir, self.download_quality)
+        self.refresh_queue_panel()
+        self.start_queue_runner([])
+    
+    def move_job(self, job_id, offset):
+        self.job_queue.move(job_id, offset)
+        self.refresh_queue_panel()
+    
+    def toggle_job_priority(self, job_id):
+        job = self.job_queue.get(job_id)
+        if job is not None:
+            self.job_queue.set_priority(job_id, 0 if job.priority > 0 else 1)
+        self.refresh_queue_panel()
+    
+    def retry_job(self, job_id):
+        self.job_queue.retry(job_id)
+        self.refresh_queue_panel()
+        self.start_queue_runner([])
+    
+    def remove_job(self, job_id):
+        self.job_queue.remove(job_id)
+        self.refresh_queue_panel()
     
     def quality_changed(self, value):
         """Handle quality selection change."""
@@ -388,6 +1118,53 @@ class YouTubeDownloaderGUI:
         }
         self.download_quality = quality_map.get(value, "highest")
     
+    def workers_changed(self, value):
+        """Handle parallel downloads selection change."""
+        self.adaptive_workers = value == "Auto"
+        if not self.adaptive_workers:
+            self.max_workers = max(1, int(value))
+    
+    def order_changed(self, value):
+        """Handle download order selection change."""
+        self.download_order = DOWNLOAD_ORDERS.get(value, "playlist")
+    
+    def rate_limit_changed(self, entry):
+        """Handle speed limit changes; a running engine follows them at once.
+
+        Returns False, and marks the field, when it cannot be parsed.
+        """
+        text = entry.get().strip()
+        try:
+            # Checked by create_engine instead while the engine is still loading
+            schedule = RateSchedule.parse(text) if text and RateSchedule is not None else None
+        except ValueError as e:
+            entry.configure(border_width=2, border_color=self.colors['error'])
+            self.post_status(f"❌ Speed limit: {e}")
+            return False
+        entry.configure(border_width=0)
+        if text == self.rate_limit_text:
+            return True
+        self.rate_limit_text = text
+        if entry is not self.limit_entry:
+            self.limit_entry.delete(0, "end")
+            self.limit_entry.insert(0, text)
+        engine = self.engine
+        if engine is not None:
+            engine.bandwidth.set_rate(None, schedule)
+        return True
+    
+    def rate_schedule(self):
+        """RateSchedule of the speed limit field, or None when it is empty."""
+        return RateSchedule.parse(self.rate_limit_text) if self.rate_limit_text else None
+    
+    def stream_changed(self):
+        """Handle streaming mode switch change."""
+        self.stream_playlist = bool(self.stream_switch.get())
+    
+    def sync_changed(self):
+        """Handle sync mode switch change."""
+        self.sync_playlist = bool(self.sync_switch.get())
+    
     def paste_url(self):
         """Paste URL from clipboard."""
         try:
@@ -405,11 +1182,29 @@ class YouTubeDownloaderGUI:
             self.dir_entry.delete(0, "end")
             self.dir_entry.insert(0, directory)
     
+    def toggle_pause(self):
+        """Pause or resume the running download."""
+        engine = self.engine
+        if engine is None:
+            return
+        if engine.paused:
+            engine.resume()
+            self.pause_btn.configure(text="⏸")
+        else:
+            engine.pause()
+            self.pause_btn.configure(text="▶")
+    
     def cancel_download(self):
         """Cancel download and return to compact view."""
+        if self.engine is not None:
+            self.engine.cancel()
+            self.engine = None
+        # Events still coming from the cancelled download are ignored
+        self.download_session += 1
         self.is_downloading = False
+        self.progress_bus.drain()
         self.download_frame.pack_forget()
-        self.root.geometry("550x650")
+        self.root.geometry("550x820")
         self.setup_compact_view()
     
     def update_status(self, message, progress=None):
@@ -421,273 +1216,374 @@ class YouTubeDownloaderGUI:
             if hasattr(self, 'progress_percentage'):
                 self.progress_percentage.configure(text=f"{int(progress * 100)}%")
     
+    def post_status(self, message, progress=None):
+        """Thread-safe update_status, coalesced through the progress bus."""
+        self.progress_bus.publish('status', self.update_status, message, progress)
+    
+    def post_video_status(self, video_id, status, progress=None, color=None, download_info=None):
+        """Thread-safe update_video_status, coalesced per video."""
+        self.progress_bus.publish(('video', video_id), self.update_video_status,
+                                  video_id, status, progress, color, download_info)
+    
+    def refresh_progress(self):
+        """Apply queued progress updates, then reschedule while downloading."""
+        downloading = self.is_downloading
+        start = time.perf_counter()
+        applied = self.progress_bus.apply()
+        engine = self.engine
+        if engine is not None and applied:
+            engine.metrics.observe('ui_refresh', time.perf_counter() - start)
+            engine.metrics.count('ui_updates', amount=applied)
+        if downloading:
+            self.root.after(PROGRESS_REFRESH_MS, self.refresh_progress)
+    
+    def export_metrics(self):
+        """Save the running engine's timings and counters next to the downloads."""
+        if self.engine is None:
+            return
+        path = Path(self.output_dir) / time.strftime("metrics-%Y%m%d-%H%M%S.json")
+        self.engine.metrics.to_json(path)
+        self.post_status(f"📊 Metrics saved to {path.name}")
+    
+    def toggle_profiling(self):
+        """Start profiling the download threads, or stop and save the profile."""
+        if self.engine is None:
+            return
+        profiler = self.engine.profiler
+        if not profiler.enabled:
+            profiler.start()
+            self.post_status("🔬 Profiling downloads (F9 to stop)")
+            return
+        path = Path(self.output_dir) / time.strftime("profile-%Y%m%d-%H%M%S.pstats")
+        if profiler.stop(path) is None:
+            self.post_status("🔬 Profiling stopped, nothing recorded")
+        else:
+            self.post_status(f"🔬 Profile saved to {path.name}")
+    
     def add_video_to_list(self, video_id, title, index, thumbnail_url=None):
-        """Add a video card to the list with thumbnail."""
-        video_card = ctk.CTkFrame(
-            self.video_list_scroll,
-            fg_color=self.colors['bg_card'],
-            corner_radius=12,
-            height=110
-        )
-        video_card.pack(fill="x", pady=5)
-        video_card.pack_propagate(False)
-        
-        card_content = ctk.CTkFrame(video_card, fg_color="transparent")
-        card_content.pack(fill="both", expand=True, padx=15, pady=12)
-        
-        # Thumbnail placeholder
-        thumbnail_frame = ctk.CTkFrame(
-            card_content,
-            width=140,
-            height=85,
-            fg_color=self.colors['bg_primary'],
-            corner_radius=8
-        )
-        thumbnail_frame.pack(side="left", padx=(0, 15))
-        thumbnail_frame.pack_propagate(False)
-        
-        # Index on thumbnail
-        index_label = ctk.CTkLabel(
-            thumbnail_frame,
-            text=str(index),
-            font=ctk.CTkFont(size=24, weight="bold"),
-            text_color=self.colors['accent_cyan']
-        )
-        index_label.place(relx=0.5, rely=0.5, anchor="center")
-        
-        # Info container
-        info_container = ctk.CTkFrame(card_content, fg_color="transparent")
-        info_container.pack(side="left", fill="both", expand=True)
-        
-        # Title
-        title_label = ctk.CTkLabel(
-            info_container,
-            text=title[:80] + "..." if len(title) > 80 else title,
-            font=ctk.CTkFont(size=12, weight="bold"),
-            text_color=self.colors['text_primary'],
-            anchor="w",
-            wraplength=600
-        )
-        title_label.pack(anchor="w")
+        """Add a video to the list; its card is built only when it scrolls into view."""
+        self.videos.add(video_id, title, index, thumbnail_url)
+        self.video_list.schedule_redraw()
+    
+    def update_video_status(self, video_id, status, progress=None, color=None, download_info=None):
+        """Update a video's status in the list."""
+        video = self.videos.get(video_id)
+        if video is None:
+            return
+        video.status = status
+        if color:
+            video.color = color
+        if progress is not None:
+            video.progress = progress
+        if download_info is not None:
+            video.download_info = download_info
+        self.video_list.refresh_video(video_id)
+    
+    def engine_listener(self, session):
+        """Engine listener that drops the events of a cancelled download."""
+        def listener(event, data):
+            if session == self.download_session:
+                self.on_engine_event(event, data)
+        return listener
+    
+    def on_engine_event(self, event, data):
+        """Engine listener: turn download events into coalesced UI updates."""
+        video_id = data.get('video_id')
+        if event == 'extracting':
+            self.post_status("🔍 Fetching playlist info...", 0)
+        elif event == 'playlist':
+            self.progress_bus.publish('playlist_title', self.playlist_title_label.configure,
+                                      {"text": data['title']})
+            if self.current_job is not None:
+                self.job_queue.set_title(self.current_job.job_id, data['title'])
+                self.root.after(0, self.refresh_queue_panel)
+        elif event == 'unchanged':
+            self.post_status("✓ Playlist unchanged since last sync")
+        elif event == 'video':
+            self.video_count += 1
+            self.root.after(0, self.add_video_to_list, video_id, data['title'], data['index'],
+                            data['thumbnail'])
+            self.progress_bus.publish('video_count', self.video_count_label.configure,
+                                      {"text": f"{self.video_count} videos"})
+        elif event == 'started':
+            if data['streaming']:
+                self.post_status("⚡ Downloading while fetching playlist...")
+            else:
+                self.post_status("⚡ Starting downloads...")
+        elif event == 'listed':
+            if data['new'] is None:
+                self.post_status(f"✨ Found {data['count']} videos")
+            else:
+                self.progress_bus.publish('video_count', self.video_count_label.configure,
+                                          {"text": f"{data['count']} videos • {data['new']} new"})
+                self.post_status(f"✨ {data['count']} videos, {data['new']} new since last sync")
+        elif event == 'downloading':
+            self.show_download_progress(data)
+        elif event == 'stats':
+            self.show_session_stats(data['session'])
+            self.show_video_counts(data['videos'])
+        elif event == 'finished':
+            download_info = f"✓ {format_bytes(data['total_bytes'])}"
+            self.post_video_status(video_id, "🔄 Merging", 1.0, self.colors['warning'], download_info)
+        elif event == 'done':
+            self.post_video_status(video_id, "✓ Done", 1.0, self.colors['success'], "")
+        elif event == 'retrying':
+            self.post_video_status(video_id, f"🔁 Retry {data['attempt']}/{data['attempts']} in {data['delay']:.0f}s",
+                                   None, self.colors['warning'], data['reason'][:80])
+        elif event == 'failed':
+            if data['kind'] == 'permanent':
+                status = "⛔ Failed (permanent)"
+            else:
+                status = f"❌ Failed after {data['attempts']} tries"
+            self.post_video_status(video_id, status, None, self.colors['error'], data['reason'][:80])
+        elif event == 'skipped':
+            if data['reason'] == 'library':
+                self.post_video_status(video_id, "🔗 Linked from library", 1.0, self.colors['success'],
+                                       data['method'])
+            else:
+                self.post_video_status(video_id, "✓ Already downloaded", 1.0, self.colors['success'], "")
+        elif event == 'concurrency':
+            arrows = {'probing': "↑", 'throttled': "↓", 'plateau': "↓"}
+            self.progress_bus.publish('concurrency', self.concurrency_label.configure, {"text": (
+                f"🎛 Auto: {data['downloads']} × {data['fragments']} "
+                f"{arrows.get(data['reason'], '=')} {data['reason']}"
+            )})
+        elif event == 'ratelimit':
+            self.rate_limit = data['limit']
+            self.show_speed()
+        elif event == 'paused':
+            self.post_status("⏸ Paused")
+        elif event == 'resumed':
+            self.post_status("▶ Resuming...")
+        elif event == 'queues':
+            publishing = data['publishing'] + data['publish_queued']
+            self.progress_bus.publish('queues', self.queue_label.configure, {"text": (
+                f"⬇ {data['downloading']} active · {data['download_queued']} queued  "
+                f"🔄 {data['postprocessing']} merging · {data['postprocess_queued']} waiting"
+                + (f"  📤 {publishing} publishing" if publishing else "")
+            )})
+    
+    def show_download_progress(self, data):
+        """Handle download progress."""
+        video_id = data['video_id']
+        downloaded_bytes = data['video_downloaded_bytes']
+        total_bytes = data['video_total_bytes']
         
-        # Download info
-        download_info_label = ctk.CTkLabel(
-            info_container,
-            text="",
-            font=ctk.CTkFont(size=10),
-            text_color=self.colors['text_secondary'],
-            anchor="w"
-        )
-        download_info_label.pack(anchor="w", pady=(3, 0))
+        percent = downloaded_bytes / total_bytes if total_bytes > 0 else 0.0
+        percent_str = f"{percent * 100:.1f}%"
+        speed = f"{format_bytes(data['speed'])}/s" if data['speed'] else "N/A"
         
-        # Progress bar
-        progress_container = ctk.CTkFrame(info_container, fg_color="transparent")
-        progress_container.pack(fill="x", pady=(8, 0))
+        downloaded_str = format_bytes(downloaded_bytes)
+        total_str = format_bytes(total_bytes) if total_bytes > 0 else "?"
+        download_info = f"📥 {downloaded_str} / {total_str} • {speed}"
         
-        progress_bar = ctk.CTkProgressBar(
-            progress_container,
-            height=6,
-            corner_radius=3,
-            progress_color=self.colors['accent_cyan'],
-            fg_color=self.colors['bg_primary']
-        )
-        progress_bar.pack(side="left", fill="x", expand=True, padx=(0, 10))
-        progress_bar.set(0)
+        self.show_session_stats(data['session'])
         
-        # Status
-        status_label = ctk.CTkLabel(
-            progress_container,
-            text="⏳ Waiting",
-            font=ctk.CTkFont(size=10, weight="bold"),
-            text_color=self.colors['text_secondary'],
-            width=100
+        if video_id:
+            self.post_video_status(video_id, f"⬇ {percent_str}", min(percent, 1.0),
+                                   self.colors['accent_cyan'], download_info)
+    
+    def show_session_stats(self, session):
+        """Show session totals: bytes, smoothed speed, ETA and overall progress."""
+        self.total_downloaded = session['downloaded_bytes']
+        self.current_speed = f"{format_bytes(session['speed'])}/s" if session['speed'] else "N/A"
+        
+        total_str = format_bytes(session['total_bytes']) if session['total_bytes'] else "?"
+        self.show_speed()
+        if hasattr(self, 'total_size_label'):
+            self.progress_bus.publish('total_size', self.total_size_label.configure,
+                                      {"text": f"Downloaded: {format_bytes(self.total_downloaded)} / ~{total_str}"})
+        
+        self.post_status(
+            f"⬇ {session['videos_finished']}/{session['videos_total']} videos • "
+            f"ETA {format_duration(session['eta'])}",
+            session['percent']
         )
-        status_label.pack(side="right")
-        
-        self.video_frames[video_id] = {
-            'card': video_card,
-            'thumbnail': thumbnail_frame,
-            'index_label': index_label,
-            'status': status_label,
-            'progress': progress_bar,
-            'download_info': download_info_label,
-            'title': title
-        }
     
-    def update_video_status(self, video_id, status, progress=None, color=None, download_info=None):
-        """Update a video's status in the list."""
-        if video_id in self.video_frames:
-            self.video_frames[video_id]['status'].configure(text=status)
-            if color:
-                self.video_frames[video_id]['status'].configure(text_color=color)
-            if progress is not None:
-                self.video_frames[video_id]['progress'].set(progress)
-                if progress >= 1.0:
-                    self.video_frames[video_id]['progress'].configure(
-                        progress_color=self.colors['success']
-                    )
-            if download_info is not None:
-                self.video_frames[video_id]['download_info'].configure(text=download_info)
-    
-    def progress_hook(self, d):
-        """Handle download progress."""
-        if d['status'] == 'downloading':
-            try:
-                info_dict = d.get('info_dict', {})
-                video_id = info_dict.get('id', '')
-                
-                if video_id and video_id != self.current_video:
-                    if self.current_video and self.current_video in self.video_frames:
-                        self.root.after(0, self.update_video_status, 
-                                      self.current_video, "✓ Done", 1.0, self.colors['success'], "")
-                    self.current_video = video_id
-                
-                percent_str = d.get('_percent_str', '0%').strip()
-                percent = float(percent_str.replace('%', '')) / 100
-                speed = d.get('_speed_str', 'N/A').strip()
-                
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                
-                # Update total downloaded size
-                self.total_downloaded = downloaded_bytes
-                self.current_speed = speed
-                
-                def format_bytes(bytes_num):
-                    if bytes_num == 0:
-                        return "0 B"
-                    for unit in ['B', 'KB', 'MB', 'GB']:
-                        if bytes_num < 1024.0:
-                            return f"{bytes_num:.1f} {unit}"
-                        bytes_num /= 1024.0
-                    return f"{bytes_num:.1f} TB"
-                
-                downloaded_str = format_bytes(downloaded_bytes)
-                total_str = format_bytes(total_bytes) if total_bytes > 0 else "?"
-                total_downloaded_str = format_bytes(self.total_downloaded)
-                
-                download_info = f"📥 {downloaded_str} / {total_str} • {speed}"
-                
-                # Update global stats
-                if hasattr(self, 'speed_label'):
-                    self.root.after(0, self.speed_label.configure, {"text": f"Speed: {speed}"})
-                if hasattr(self, 'total_size_label'):
-                    self.root.after(0, self.total_size_label.configure, 
-                                  {"text": f"Downloaded: {total_downloaded_str}"})
-                
-                self.root.after(0, self.update_status, f"⬇ Downloading... {percent_str}", None)
-                
-                if video_id:
-                    self.root.after(0, self.update_video_status,
-                                  video_id, f"⬇ {percent_str}", percent, self.colors['accent_cyan'], download_info)
-            except Exception as e:
-                pass
-                
-        elif d['status'] == 'finished':
-            info_dict = d.get('info_dict', {})
-            video_id = info_dict.get('id', '')
-            if video_id:
-                file_size = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                
-                def format_bytes(bytes_num):
-                    if bytes_num == 0:
-                        return "0 B"
-                    for unit in ['B', 'KB', 'MB', 'GB']:
-                        if bytes_num < 1024.0:
-                            return f"{bytes_num:.1f} {unit}"
-                        bytes_num /= 1024.0
-                    return f"{bytes_num:.1f} TB"
-                
-                size_str = format_bytes(file_size)
-                download_info = f"✓ {size_str}"
-                
-                self.root.after(0, self.update_video_status,
-                              video_id, "🔄 Merging", 1.0, self.colors['warning'], download_info)
-    
-    def download_playlist(self):
-        """Download the playlist."""
-        url = self.url_entry.get().strip()
-        
-        if not url:
+    def show_speed(self):
+        """Show the session speed and the bandwidth limit in effect."""
+        if hasattr(self, 'speed_label'):
+            limit = f" (limit {format_bytes(self.rate_limit)}/s)" if self.rate_limit else ""
+            self.progress_bus.publish('speed', self.speed_label.configure,
+                                      {"text": f"Speed: {self.current_speed}{limit}"})
+    
+    def show_video_counts(self, counts):
+        """Show how many listed videos are done, skipped or failed."""
+        parts = [f"{sum(counts.values())} videos"]
+        for status, label in (('done', "done"), ('skipped', "skipped"), ('failed', "failed")):
+            if counts[status]:
+                parts.append(f"{counts[status]} {label}")
+        self.progress_bus.publish('video_count', self.video_count_label.configure,
+                                  {"text": " • ".join(parts)})
+    
+    def process_queue(self, urls):
+        """Queue the given URLs, then download every queued job on one engine."""
+        self.engine_ready.wait()
+        if self.engine_error is not None:
+            self.post_status("❌ Error: yt-dlp is not installed (pip install yt-dlp)", 0)
+            self.is_downloading = False
             return
         
-        self.output_dir = self.dir_entry.get().strip()
-        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Build format string based on quality
-        format_str = 'bestvideo+bestaudio/best'
-        if self.download_quality == '1080p':
-            format_str = 'bestvideo[height<=1080]+bestaudio/best[height<=1080]'
-        elif self.download_quality == '720p':
-            format_str = 'bestvideo[height<=720]+bestaudio/best[height<=720]'
-        elif self.download_quality == 'audio':
-            format_str = 'bestaudio/best'
-        
-        ydl_opts = {
-            'format': format_str,
-            'outtmpl': os.path.join(self.output_dir, '%(playlist_title)s/%(playlist_index)s - %(title)s.%(ext)s'),
-            'merge_output_format': 'mp4' if self.download_quality != 'audio' else 'm4a',
-            'ignoreerrors': True,
-            'quiet': True,
-            'no_warnings': True,
-            'progress_hooks': [self.progress_hook],
-        }
+        for url in urls:
+            self.job_queue.add(url, self.output_dir, self.download_quality)
+        self.root.after(0, self.refresh_queue_panel)
         
+        session = self.download_session
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                self.root.after(0, self.update_status, "🔍 Fetching playlist info...", 0.05)
-                info = ydl.extract_info(url, download=False)
-                
-                if 'entries' in info:
-                    playlist_title = info.get('title', 'Unknown Playlist')
-                    entries = [e for e in info['entries'] if e]
-                    video_count = len(entries)
-                    
-                    self.root.after(0, self.playlist_title_label.configure, {"text": playlist_title})
-                    self.root.after(0, self.video_count_label.configure, {"text": f"{video_count} videos"})
-                    self.root.after(0, self.update_status, f"✨ Found {video_count} videos", 0.1)
-                    
-                    for idx, entry in enumerate(entries, 1):
-                        video_id = entry.get('id', f'video_{idx}')
-                        title = entry.get('title', 'Unknown Title')
-                        thumbnail = entry.get('thumbnail')
-                        self.root.after(0, self.add_video_to_list, video_id, title, idx, thumbnail)
-                
-                self.root.after(0, self.update_status, "⚡ Starting downloads...", 0.15)
-                ydl.download([url])
-                
-                if self.current_video and self.current_video in self.video_frames:
-                    self.root.after(0, self.update_video_status,
-                                  self.current_video, "✓ Done", 1.0, self.colors['success'], "")
-            
-            self.root.after(0, self.update_status, "🎉 All downloads completed!", 1.0)
+            engine = self.create_engine(session, self.output_dir, self.download_quality)
+            with engine:
+                failed = run_queue(engine, self.job_queue, on_job=self.job_changed)
+            if not engine.cancelled.is_set():
+                if failed:
+                    self.post_status(f"⚠ Queue finished, {failed} job(s) failed", 1.0)
+                elif self.last_failed:
+                    self.post_status(f"⚠ Finished, {len(self.last_failed[1])} video(s) failed", 1.0)
+                else:
+                    self.post_status("🎉 All downloads completed!", 1.0)
             
         except Exception as e:
-            self.root.after(0, self.update_status, f"❌ Error: {str(e)}", 0)
+            if session == self.download_session:
+                self.post_status(f"❌ Error: {str(e)}", 0)
         
         finally:
-            self.is_downloading = False
+            if session == self.download_session:
+                self.is_downloading = False
+                self.engine = None
+                self.current_job = None
+                self.root.after(0, self.show_retry_button)
+            self.root.after(0, self.refresh_queue_panel)
     
-    def start_download(self):
-        """Start download in a separate thread."""
+    def create_engine(self, session, output_dir, quality):
+        """Build a DownloadEngine with the selected settings for a download session."""
+        engine = DownloadEngine(
+            output_dir,
+            quality=quality,
+            max_workers=ADAPTIVE_MAX_WORKERS if self.adaptive_workers else self.max_workers,
+            adaptive=self.adaptive_workers,
+            stream=self.stream_playlist,
+            sync=self.sync_playlist,
+            schedule=self.download_order,
+            library=default_library_path(),
+            rate_schedule=self.rate_schedule(),
+            staging_dir=self.staging_dir or None,
+            listener=self.engine_listener(session)
+        )
+        self.engine = engine
+        if session != self.download_session:
+            # Cancelled while the engine was being created
+            engine.cancel()
+        return engine
+    
+    def job_changed(self, job, outcome):
+        """run_queue callback (download thread): a job started (outcome None) or ended."""
+        if outcome is None:
+            self.current_job = job
+            self.last_failed = None
+            self.root.after(0, self.show_job, job)
+        else:
+            if outcome == 'failed':
+                self.post_status(f"❌ Error: {self.job_queue.get(job.job_id).error}", 0)
+            engine = self.engine
+            if engine is not None and engine.failed:
+                # Videos of the job on screen that can be retried on their own
+                self.last_failed = (job, list(engine.failed))
+        self.root.after(0, self.refresh_queue_panel)
+    
+    def show_retry_button(self):
+        """Offer to retry the failed videos of the last job once downloading stopped."""
+        if not hasattr(self, 'retry_btn') or not self.retry_btn.winfo_exists():
+            return
+        if self.last_failed and not self.is_downloading:
+            self.retry_btn.configure(text=f"↻ Retry {len(self.last_failed[1])} failed")
+            self.retry_btn.pack(side="left", padx=(0, 8), before=self.pause_btn)
+        else:
+            self.retry_btn.pack_forget()
+    
+    def retry_failed_videos(self):
+        """Download only the failed videos of the last job again."""
+        if self.is_downloading or not self.last_failed:
+            return
+        job, failed = self.last_failed
+        self.last_failed = None
+        self.retry_btn.pack_forget()
+        for entry, *_ in failed:
+            video = self.videos.get(entry.get('id', ''))
+            if video is not None:
+                video.status = "⏳ Waiting"
+                video.progress = 0.0
+                video.color = None
+                video.download_info = ""
+                self.video_list.refresh_video(video.video_id)
+        self.update_status(f"↻ Retrying {len(failed)} failed video(s)...", 0)
+        self.is_downloading = True
+        threading.Thread(target=self.process_retry, args=(job, failed), daemon=True).start()
+        self.root.after(PROGRESS_REFRESH_MS, self.refresh_progress)
+    
+    def process_retry(self, job, failed):
+        """Background part of retry_failed_videos."""
+        session = self.download_session
+        try:
+            engine = self.create_engine(session, job.output_dir, job.quality)
+            with engine:
+                engine.retry_failed(failed)
+            if not engine.cancelled.is_set():
+                if engine.failed:
+                    self.last_failed = (job, list(engine.failed))
+                    self.post_status(f"⚠ {len(engine.failed)} video(s) still failed", 1.0)
+                else:
+                    self.post_status("🎉 All downloads completed!", 1.0)
+        except Exception as e:
+            if session == self.download_session:
+                self.post_status(f"❌ Error: {str(e)}", 0)
+        finally:
+            if session == self.download_session:
+                self.is_downloading = False
+                self.engine = None
+                self.root.after(0, self.show_retry_button)
+    
+    def show_job(self, job):
+        """Start a fresh video list and stats for a job."""
+        self.video_count = 0
+        self.videos = VideoStore()
+        self.video_list.set_store(self.videos)
+        self.playlist_title_label.configure(text=job.title or job.url)
+        self.video_count_label.configure(text="0 videos")
+        self.update_status("🔍 Fetching playlist info...", 0)
+    
+    def start_queue_runner(self, urls):
+        """Start downloading the queue in a separate thread, unless it already runs."""
         if self.is_downloading:
+            if urls and self.job_queue is not None:
+                # The running queue picks these up after its current job
+                for url in urls:
+                    self.job_queue.add(url, self.output_dir, self.download_quality)
+                self.refresh_queue_panel()
             return
-        
-        url = self.url_entry.get().strip()
-        if not url:
+        self.is_downloading = True
+        download_thread = threading.Thread(target=self.process_queue, args=(urls,), daemon=True)
+        download_thread.start()
+        self.root.after(PROGRESS_REFRESH_MS, self.refresh_progress)
+    
+    def start_download(self):
+        """Queue the entered URLs and switch to the download view."""
+        urls = self.url_entry.get().split()
+        queued = self.job_queue is not None and any(job.status == 'queued' for job in self.job_queue.jobs())
+        if not urls and not queued:
             return
         
-        self.is_downloading = True
+        self.output_dir = self.dir_entry.get().strip()
+        self.staging_dir = self.staging_entry.get().strip()
+        if not self.rate_limit_changed(self.limit_entry):
+            return
         
         # Switch to download view
         self.setup_download_view()
-        
-        download_thread = threading.Thread(target=self.download_playlist, daemon=True)
-        download_thread.start()
+        self.start_queue_runner(urls)
     
     def run(self):
         """Run the application."""
         self.root.mainloop()
+        self.thumbnails.close()
 
 
 if __name__ == "__main__":
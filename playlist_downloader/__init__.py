@@ -0,0 +1,30 @@
+"""
+Headless download engine behind the YouTube Playlist Downloader GUI.
+Usable as a library or from the command line (python -m playlist_downloader).
+
+The exports below are imported on first use, so light modules such as
+playlist_downloader.paths can be used without loading yt-dlp.
+"""
+
+import importlib
+
+# Exported name -> module that defines it
+EXPORTS = {
+    'DownloadArchive': 'archive',
+    'PlaylistCache': 'archive',
+    'DownloadEngine': 'engine',
+    'PERFORMANCE_PROFILES': 'engine',
+    'QUALITY_FORMATS': 'engine',
+    'JobQueue': 'jobs',
+    'run_queue': 'jobs',
+    'LibraryIndex': 'library',
+}
+
+__all__ = ['DownloadArchive', 'DownloadEngine', 'JobQueue', 'LibraryIndex', 'PERFORMANCE_PROFILES',
+           'PlaylistCache', 'QUALITY_FORMATS', 'run_queue']
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{EXPORTS[name]}', __name__), name)
@@ -0,0 +1,138 @@
+"""
+Session accounting: bytes per video and for the whole session, smoothed
+throughput, ETA and overall percent complete.
+Updated from every progress hook call, so every update is O(1).
+"""
+
+import math
+import threading
+import time
+
+# Time constant of the throughput average, and how often it is updated
+THROUGHPUT_TAU = 5.0
+THROUGHPUT_TICK = 0.5
+
+
+class SessionStats:
+    """Byte and video counters of one download session, shared by all workers.
+
+    Files are keyed by (video_id, format_id): a video downloaded as separate
+    video and audio formats has two files. Videos that have not started yet
+    are assumed to be as large as the average video whose size is known.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.video_files = {}
+        self.sized_videos = set()
+        self.downloaded_bytes = 0
+        self.known_total_bytes = 0
+        self.videos_total = 0
+        self.videos_finished = 0
+        self.unsized_finished = 0
+        self.speed = None
+        self.tick_start = time.monotonic()
+        self.tick_bytes = 0
+
+    def add_video(self, video_id):
+        """Count a video queued for download."""
+        with self.lock:
+            self.videos_total += 1
+            self.video_files.setdefault(video_id, [])
+
+    def update(self, video_id, format_id, downloaded_bytes, total_bytes):
+        """Record a progress hook call; returns the bytes downloaded since the last one."""
+        key = (video_id, format_id)
+        with self.lock:
+            file = self.files.get(key)
+            if file is None:
+                file = self.files[key] = [0, 0]
+                self.video_files.setdefault(video_id, []).append(key)
+            # A restarted file reports fewer bytes than before
+            delta = downloaded_bytes - file[0]
+            self.downloaded_bytes += delta
+            file[0] = downloaded_bytes
+            if total_bytes and total_bytes != file[1]:
+                self.known_total_bytes += total_bytes - file[1]
+                file[1] = total_bytes
+                self.sized_videos.add(video_id)
+            self.tick(max(0, delta))
+            return max(0, delta)
+
+    def has_file(self, video_id, format_id):
+        """Whether progress of a file was recorded, i.e. it was transferred in this session."""
+        with self.lock:
+            return (video_id, format_id) in self.files
+
+    def tick(self, delta):
+        """Fold new bytes into the exponentially weighted throughput. Called with lock held."""
+        self.tick_bytes += delta
+        now = time.monotonic()
+        elapsed = now - self.tick_start
+        if elapsed < THROUGHPUT_TICK:
+            return
+        rate = self.tick_bytes / elapsed
+        if self.speed is None:
+            self.speed = rate
+        else:
+            # Weight by elapsed time so uneven ticks average correctly
+            self.speed += (1 - math.exp(-elapsed / THROUGHPUT_TAU)) * (rate - self.speed)
+        self.tick_start = now
+        self.tick_bytes = 0
+
+    def finish_video(self, video_id, completed=True):
+        """Count a video as finished; unfinished bytes of a failed one are dropped."""
+        with self.lock:
+            self.videos_finished += 1
+            keys = self.video_files.get(video_id, [])
+            if not completed:
+                # Not a sample of the typical video size
+                self.sized_videos.discard(video_id)
+            if video_id not in self.sized_videos:
+                self.unsized_finished += 1
+            for key in keys:
+                file = self.files[key]
+                if file[1] > file[0]:
+                    if completed:
+                        # Estimated sizes can be a little too large
+                        self.downloaded_bytes += file[1] - file[0]
+                        file[0] = file[1]
+                    else:
+                        self.known_total_bytes -= file[1] - file[0]
+                        file[1] = file[0]
+
+    def video(self, video_id):
+        """(downloaded_bytes, total_bytes) of one video, over all of its files."""
+        with self.lock:
+            downloaded = total = 0
+            for key in self.video_files.get(video_id, []):
+                file = self.files[key]
+                downloaded += file[0]
+                total += file[1]
+            return downloaded, total
+
+    def snapshot(self):
+        """Aggregate numbers for display, as a dict."""
+        with self.lock:
+            sized = len(self.sized_videos)
+            pending_unsized = max(0, self.videos_total - sized - self.unsized_finished)
+            average = self.known_total_bytes / sized if sized else 0
+            total = self.known_total_bytes + average * pending_unsized
+            if self.videos_total and self.videos_finished >= self.videos_total:
+                percent = 1.0
+            elif total and (sized or not self.videos_total):
+                percent = min(1.0, self.downloaded_bytes / total)
+            else:
+                percent = self.videos_finished / self.videos_total if self.videos_total else 0.0
+            remaining = max(0, total - self.downloaded_bytes)
+            eta = remaining / self.speed if self.speed and total else None
+            return {
+                'downloaded_bytes': self.downloaded_bytes,
+                'total_bytes': int(total),
+                'speed': self.speed,
+                'eta': eta,
+                'percent': percent,
+                'videos_finished': self.videos_finished,
+                'videos_total': self.videos_total,
+            }
@@ -0,0 +1,180 @@
+"""
+Download archive and playlist cache.
+Both live in one SQLite file inside the output directory.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import yt_dlp
+
+# Download archive kept in the output directory
+ARCHIVE_FILENAME = '.download_archive.sqlite3'
+
+
+def archive_id(info):
+    """yt-dlp's archive key for an info dict or flat entry ("youtube <id>")."""
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    if not extractor or not info.get('id'):
+        return None
+    return yt_dlp.utils.make_archive_id(extractor, info['id'])
+
+
+class DownloadArchive:
+    """SQLite download archive, passed to yt-dlp as 'download_archive'.
+
+    yt-dlp asks `archive_id in archive` before extracting a playlist entry and
+    calls add() once a video is fully downloaded and merged. Format, size, path
+    and quality are recorded alongside. Unfinished downloads are not tracked
+    here: yt-dlp resumes them from their .part files (continuedl).
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS downloads ('
+            ' archive_id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' format_id TEXT,'
+            ' filesize INTEGER,'
+            ' filepath TEXT,'
+            ' updated REAL,'
+            ' quality TEXT)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(downloads)')}
+        if 'quality' not in columns:
+            self._conn.execute('ALTER TABLE downloads ADD COLUMN quality TEXT')
+        self._conn.commit()
+        self._done = {row[0] for row in self._conn.execute(
+            "SELECT archive_id FROM downloads WHERE status = 'done'")}
+
+    def __contains__(self, archive_id):
+        return archive_id in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def add(self, archive_id):
+        """Mark a video as completely downloaded (called by yt-dlp)."""
+        with self._lock:
+            self._done.add(archive_id)
+            self._conn.execute(
+                "INSERT INTO downloads (archive_id, status, updated) VALUES (?, 'done', ?) "
+                "ON CONFLICT(archive_id) DO UPDATE SET status = 'done', updated = excluded.updated",
+                (archive_id, time.time()))
+            self._conn.commit()
+
+    def record_download(self, info, quality=None):
+        """Store format, size, path and the requested quality of a finished download."""
+        key = archive_id(info)
+        if key not in self._done:
+            return
+        downloads = info.get('requested_downloads') or [{}]
+        filesize = sum(d.get('filesize') or d.get('filesize_approx') or 0
+                       for d in info.get('requested_formats') or [info])
+        with self._lock:
+            self._conn.execute(
+                'UPDATE downloads SET format_id = ?, filesize = ?, filepath = ?, quality = ? '
+                'WHERE archive_id = ?',
+                (info.get('format_id'), filesize or None,
+                 downloads[0].get('filepath') or info.get('filepath'), quality, key))
+            self._conn.commit()
+
+    def filepath(self, archive_id):
+        """Path of a finished download, or None when it was not recorded."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT filepath FROM downloads WHERE archive_id = ?', (archive_id,)).fetchone()
+        return row[0] if row else None
+
+    def move(self, archive_id, filepath):
+        """Record the new path of a finished download that was renamed."""
+        with self._lock:
+            self._conn.execute('UPDATE downloads SET filepath = ?, updated = ? WHERE archive_id = ?',
+                               (filepath, time.time(), archive_id))
+            self._conn.commit()
+
+    def forget(self, archive_id):
+        """Drop a video from the archive so it is downloaded again."""
+        with self._lock:
+            self._done.discard(archive_id)
+            self._conn.execute('DELETE FROM downloads WHERE archive_id = ?', (archive_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def entry_signature(entry):
+    """What counts as a change of a playlist entry between two syncs."""
+    duration = entry.get('duration')
+    return f"{entry.get('title')}|{None if duration is None else round(duration)}"
+
+
+def playlist_sync_tag(info, head_entries):
+    """ETag-like fingerprint of a playlist from its metadata and first entries."""
+    data = [info.get('playlist_count'), info.get('modified_date'),
+            [(e.get('id'), entry_signature(e)) for e in head_entries if e]]
+    return hashlib.sha1(json.dumps(data).encode('utf-8')).hexdigest()
+
+
+class PlaylistCache:
+    """Flat entry lists of synced playlists, keyed by playlist id."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS playlists ('
+            ' playlist_id TEXT PRIMARY KEY,'
+            ' title TEXT,'
+            ' sync_tag TEXT,'
+            ' synced REAL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS playlist_entries ('
+            ' playlist_id TEXT NOT NULL,'
+            ' position INTEGER NOT NULL,'
+            ' video_id TEXT NOT NULL,'
+            ' ie_key TEXT,'
+            ' url TEXT,'
+            ' title TEXT,'
+            ' duration REAL,'
+            ' PRIMARY KEY (playlist_id, position))'
+        )
+        self._conn.commit()
+
+    def load(self, playlist_id):
+        """Return (sync_tag, [(index, flat entry)]) from the last sync."""
+        row = self._conn.execute(
+            'SELECT sync_tag FROM playlists WHERE playlist_id = ?', (playlist_id,)).fetchone()
+        if row is None:
+            return None, []
+        entries = [
+            (position, {'_type': 'url', 'id': video_id, 'ie_key': ie_key, 'url': url,
+                        'title': title, 'duration': duration})
+            for position, video_id, ie_key, url, title, duration in self._conn.execute(
+                'SELECT position, video_id, ie_key, url, title, duration FROM playlist_entries '
+                'WHERE playlist_id = ? ORDER BY position', (playlist_id,))
+        ]
+        return row[0], entries
+
+    def store(self, playlist_id, title, sync_tag, entries):
+        """Replace the cached listing of a playlist with [(index, flat entry)]."""
+        with self._conn:
+            self._conn.execute('DELETE FROM playlist_entries WHERE playlist_id = ?', (playlist_id,))
+            self._conn.executemany(
+                'INSERT INTO playlist_entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(playlist_id, position, e.get('id'), e.get('ie_key'), e.get('url'),
+                  e.get('title'), e.get('duration')) for position, e in entries])
+            self._conn.execute(
+                'INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?)',
+                (playlist_id, title, sync_tag, time.time()))
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,173 @@
+"""
+Bandwidth shaping shared by every download of an engine.
+A token bucket caps the bytes per second of all downloads together. An
+optional schedule changes the cap by time of day and weekday (e.g. 20 MB/s
+during business hours, unlimited at night); the cap follows it while
+downloads run.
+"""
+
+import datetime
+import re
+import threading
+import time
+
+import yt_dlp
+
+# Seconds of traffic the bucket lets through at once after an idle period
+BURST_SECONDS = 1.0
+
+# How often the schedule is looked at
+SCHEDULE_CHECK_INTERVAL = 1.0
+
+# Longest single sleep of a throttled download, so cancelling stays responsive
+MAX_WAIT_SLICE = 0.25
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+WINDOW_PATTERN = re.compile(
+    r'^(?:(?P<first>[a-z]{3})(?:-(?P<last>[a-z]{3}))?\s+)?'
+    r'(?P<start>\d{1,2}:\d{2})-(?P<end>\d{1,2}:\d{2})\s*=\s*(?P<rate>\S+)$')
+
+
+def parse_rate(text):
+    """Bytes per second from '20M', '500K', '20MB/s' or '1.5M'; None for
+    'unlimited', 'none', 'off' or '0'. Units are binary, as in yt-dlp's --limit-rate."""
+    text = text.strip().lower()
+    if text in ('unlimited', 'none', 'off', '0', ''):
+        return None
+    value = yt_dlp.utils.parse_bytes(re.sub(r'(?:i?b)?(?:/s|ps)?$', '', text))
+    if value is None:
+        raise ValueError(f"invalid rate: {text}")
+    return value or None
+
+
+def format_rate(rate):
+    """A rate for display, e.g. '20.0 MiB/s' or 'unlimited'."""
+    if rate is None:
+        return "unlimited"
+    return f"{yt_dlp.utils.format_bytes(rate)}/s"
+
+
+def parse_minutes(text):
+    hours, minutes = map(int, text.split(':'))
+    # 24:00 is the end of the day; no later time is
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError(f"invalid time: {text}")
+    return hours * 60 + minutes
+
+
+class RateSchedule:
+    """Rate limits by weekday and time of day.
+
+    Parsed from windows separated by ',' or ';', each '[DAY[-DAY]] HH:MM-HH:MM=RATE',
+    e.g. 'mon-fri 09:00-18:00=20M, 18:00-09:00=unlimited'. A window may run
+    past midnight; the first matching window wins, and outside every window
+    the default applies. A part that is just a rate sets the default.
+    """
+
+    def __init__(self, windows=(), default=None):
+        self.windows = list(windows)
+        self.default = default
+
+    @classmethod
+    def parse(cls, text, default=None):
+        windows = []
+        for part in re.split(r'[;,]', text):
+            part = part.strip().lower()
+            if not part:
+                continue
+            if '=' not in part:
+                default = parse_rate(part)
+                continue
+            match = WINDOW_PATTERN.match(part)
+            if match is None:
+                raise ValueError(f"invalid schedule window: {part!r}")
+            days = set(range(7))
+            if match['first']:
+                if match['first'] not in WEEKDAYS or (match['last'] and match['last'] not in WEEKDAYS):
+                    raise ValueError(f"invalid weekday in {part!r}")
+                first = WEEKDAYS.index(match['first'])
+                last = WEEKDAYS.index(match['last'] or match['first'])
+                days = {(first + n) % 7 for n in range((last - first) % 7 + 1)}
+            windows.append((days, parse_minutes(match['start']), parse_minutes(match['end']),
+                            parse_rate(match['rate'])))
+        return cls(windows, default)
+
+    def limit_at(self, when):
+        """Bytes per second allowed at the datetime when (None: unlimited)."""
+        minute = when.hour * 60 + when.minute
+        weekday = when.weekday()
+        for days, start, end, rate in self.windows:
+            if start <= end:
+                if weekday in days and start <= minute < end:
+                    return rate
+            # Past midnight: the part after midnight belongs to the day it started
+            elif (weekday in days and minute >= start) or ((weekday - 1) % 7 in days and minute < end):
+                return rate
+        return self.default
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all downloads.
+
+    Workers call consume() with the bytes they just received; it sleeps as
+    long as the downloads are ahead of the limit, which slows down their
+    reads and so the transfer itself. The limit is a fixed rate, or follows a
+    RateSchedule; set_rate() changes it at any time. on_change(limit) is
+    called whenever the limit in effect changes.
+    """
+
+    def __init__(self, rate=None, schedule=None, on_change=None):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.schedule = schedule
+        self.on_change = on_change
+        self.limit = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.checked = 0.0
+        self.refresh()
+
+    def set_rate(self, rate, schedule=None):
+        """Replace the fixed rate and the schedule; running downloads follow at once."""
+        with self.lock:
+            self.rate = rate
+            self.schedule = schedule
+            self.checked = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """Apply the limit the schedule (or the fixed rate) asks for now."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.checked < SCHEDULE_CHECK_INTERVAL:
+                return
+            self.checked = now
+            limit = self.rate
+            if self.schedule is not None:
+                limit = self.schedule.limit_at(datetime.datetime.now())
+            if limit == self.limit:
+                return
+            self.limit = limit
+            self.tokens = min(self.tokens, limit * BURST_SECONDS) if limit else 0.0
+            self.updated = now
+        if self.on_change is not None:
+            self.on_change(limit)
+
+    def consume(self, amount, abort=None):
+        """Take amount bytes from the bucket, sleeping while it is in debt."""
+        self.refresh()
+        with self.lock:
+            if not self.limit or amount <= 0:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.limit * BURST_SECONDS, self.tokens + (now - self.updated) * self.limit)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.limit
+        while wait > 0:
+            # Cancelled, or the limit was lifted meanwhile
+            if (abort is not None and abort.is_set()) or not self.limit:
+                return
+            time.sleep(min(wait, MAX_WAIT_SLICE))
+            wait -= MAX_WAIT_SLICE
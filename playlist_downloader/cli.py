@@ -0,0 +1,194 @@
+"""
+Command line client of the download engine.
+Prints one JSON object per line for every engine event, e.g.
+
+    {"event": "downloading", "url": "...", "video_id": "...", "downloaded_bytes": 1048576, ...}
+
+Usage: python -m playlist_downloader URL [URL ...] [-o DIR] [-q QUALITY] [-j WORKERS]
+       python -m playlist_downloader [URL ...] --queue FILE [--priority N]
+       python -m playlist_downloader --reconcile DIR [--reconcile DIR ...]
+
+Ctrl+C cancels the running downloads and removes their partial files.
+With --metrics-port, phase timings and counters are served on localhost
+(/metrics, /metrics.json) and profiling can be switched on and off there
+(/profile/start, /profile/stop).
+"""
+
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import yt_dlp
+
+from .bandwidth import RateSchedule, parse_rate
+from .engine import QUALITY_FORMATS, DownloadEngine
+from .jobs import JobQueue, run_queue
+from .library import LINK_MODES, LibraryIndex, default_library_path
+from .retry import RETRY_ATTEMPTS
+from .scheduling import SCHEDULING_MODES
+from .staging import STAGING_LIMIT
+
+
+class JsonLinesWriter:
+    """Engine listener writing events as JSON lines (called from many threads)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.url = None
+
+    def __call__(self, event, data):
+        line = json.dumps({'event': event, 'time': round(time.time(), 3), 'url': self.url, **data},
+                          ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def parse_size(text):
+    """argparse type of byte sizes such as 4G or 500M."""
+    size = yt_dlp.utils.parse_bytes(text)
+    if size is None:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    return size
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m playlist_downloader',
+        description="Download YouTube playlists and videos, reporting progress as JSON lines."
+    )
+    parser.add_argument('urls', nargs='*', metavar='URL', help="playlist or video URLs")
+    parser.add_argument('-o', '--output-dir', default=str(Path.home() / "Downloads" / "YouTube"),
+                        help="download directory (default: %(default)s)")
+    parser.add_argument('-q', '--quality', choices=list(QUALITY_FORMATS), default='highest',
+                        help="target quality (default: %(default)s)")
+    parser.add_argument('-j', '--workers', type=int, default=3,
+                        help="videos downloaded at once (default: %(default)s)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="adapt parallel downloads and fragment threads to throughput and "
+                             "throttling, up to --workers")
+    parser.add_argument('--postprocess-workers', type=int, default=2,
+                        help="ffmpeg merges run at once, next to the downloads (default: %(default)s)")
+    parser.add_argument('--order', choices=SCHEDULING_MODES, default='playlist',
+                        help="download order: playlist order, smallest videos first, or "
+                             "balanced (alternating small and large) (default: %(default)s)")
+    parser.add_argument('--retries', type=int, default=RETRY_ATTEMPTS - 1,
+                        help="extra attempts for videos that failed with a network or server error "
+                             "(default: %(default)s)")
+    parser.add_argument('--limit-rate', metavar='RATE',
+                        help="bandwidth of all downloads together, e.g. 20M or 500K bytes per second")
+    parser.add_argument('--rate-schedule', metavar='WINDOWS',
+                        help="rate limits by time of day, e.g. 'mon-fri 09:00-18:00=20M'; "
+                             "--limit-rate applies outside the windows")
+    parser.add_argument('--staging-dir', metavar='DIR',
+                        help="fast local directory for .part files and merges; finished files "
+                             "are then moved or copied to the output directory")
+    parser.add_argument('--staging-limit', metavar='SIZE', type=parse_size, default=STAGING_LIMIT,
+                        help="finished files kept in the staging directory before new downloads "
+                             "wait for publishing (default: 4G)")
+    parser.add_argument('--publish-workers', type=int, default=2,
+                        help="files moved or copied to the output directory at once "
+                             "(default: %(default)s)")
+    parser.add_argument('--no-stream', action='store_true',
+                        help="list the whole playlist before starting downloads")
+    parser.add_argument('--sync', action='store_true',
+                        help="only fetch videos that are new since the last run")
+    parser.add_argument('--library', metavar='FILE', default=str(default_library_path()),
+                        help="index of every downloaded video; videos already in it are linked "
+                             "instead of downloaded again (default: %(default)s)")
+    parser.add_argument('--no-library', action='store_true',
+                        help="do not use or update the library index")
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='auto',
+                        help="how videos from the library are linked; auto tries a hardlink, "
+                             "a reflink, then a symlink (default: %(default)s)")
+    parser.add_argument('--reconcile', metavar='DIR', action='append', default=[],
+                        help="rebuild the library index from disk and the download archive of DIR "
+                             "(repeatable) before downloading")
+    parser.add_argument('--queue', metavar='FILE',
+                        help="persistent job queue: the URLs are added to it, then every queued "
+                             "job (also from earlier runs) is downloaded")
+    parser.add_argument('--priority', type=int, default=0,
+                        help="priority of the added jobs; higher runs first (default: %(default)s)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve timings and counters on http://127.0.0.1:PORT/metrics "
+                             "(0 picks a free port)")
+    parser.add_argument('--metrics-json', metavar='FILE',
+                        help="write timings and counters to FILE when done")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="profile the download threads with cProfile, saved to FILE")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.urls and not args.queue and not args.reconcile:
+        parser.error("give at least one URL, or --queue to resume a job queue")
+    if args.reconcile and args.no_library:
+        parser.error("--reconcile needs the library index")
+    try:
+        rate_limit = parse_rate(args.limit_rate) if args.limit_rate else None
+        rate_schedule = RateSchedule.parse(args.rate_schedule, rate_limit) if args.rate_schedule else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    writer = JsonLinesWriter(sys.stdout)
+    if args.reconcile:
+        started = time.perf_counter()
+        library = LibraryIndex(args.library)
+        counts = library.reconcile(args.reconcile)
+        writer('reconciled', {**counts, 'seconds': round(time.perf_counter() - started, 3)})
+        # Waits for the files that are new or changed since they were hashed
+        library.close(wait=True)
+        if not args.urls and not args.queue:
+            return 0
+
+    queue = JobQueue(args.queue or ':memory:')
+    for url in args.urls:
+        queue.add(url, args.output_dir, args.quality, args.priority)
+
+    failed_videos = []
+
+    def on_job(job, outcome):
+        writer.url = job.url
+        if outcome is None:
+            writer('job', {'job_id': job.job_id, 'output_dir': job.output_dir, 'quality': job.quality})
+        elif outcome == 'failed':
+            writer('error', {'message': queue.get(job.job_id).error})
+        else:
+            failed_videos.extend(engine.failed)
+            writer('completed' if outcome == 'done' else outcome,
+                   {'failed_videos': len(engine.failed), 'videos': engine.videos.counts()})
+
+    # One engine for every job: workers, cookies and connections are reused
+    with DownloadEngine(args.output_dir, quality=args.quality, max_workers=max(1, args.workers),
+                        stream=not args.no_stream, sync=args.sync, listener=writer,
+                        postprocess_workers=max(1, args.postprocess_workers),
+                        adaptive=args.adaptive, schedule=args.order,
+                        retry_attempts=max(0, args.retries) + 1,
+                        library=None if args.no_library else args.library,
+                        link_mode=args.link_mode, rate_limit=rate_limit,
+                        rate_schedule=rate_schedule, staging_dir=args.staging_dir,
+                        publish_workers=max(1, args.publish_workers),
+                        max_staged_bytes=args.staging_limit) as engine:
+        # Cancel cooperatively so workers exit and partial files are cleaned up
+        signal.signal(signal.SIGINT, lambda signum, frame: engine.cancel())
+        if args.metrics_port is not None:
+            writer('metrics', {'port': engine.serve_metrics(args.metrics_port)})
+        if args.profile:
+            engine.profiler.start()
+        failed = run_queue(engine, queue, on_job)
+        if args.profile:
+            engine.profiler.stop(args.profile)
+        if args.metrics_json:
+            engine.metrics.to_json(args.metrics_json)
+    queue.close()
+
+    if engine.cancelled.is_set():
+        return 130
+    return 1 if failed or failed_videos else 0
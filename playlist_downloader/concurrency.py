@@ -0,0 +1,182 @@
+"""
+Adaptive download concurrency.
+An AIMD controller (additive increase, multiplicative decrease) sizes the
+number of simultaneous downloads and yt-dlp fragment threads from the
+aggregate throughput and from throttling errors reported by yt-dlp.
+"""
+
+import re
+import sys
+import threading
+import time
+
+# Seconds of progress the controller looks at before each decision
+ADAPT_INTERVAL = 5.0
+
+# Relative throughput gain an extra download or fragment thread must bring
+ADAPT_MIN_GAIN = 0.10
+
+# Decisions skipped after backing off, so the new level can settle
+ADAPT_COOLDOWN = 2
+
+MAX_FRAGMENT_THREADS = 8
+
+# yt-dlp messages that mean the server wants fewer requests
+THROTTLE_PATTERN = re.compile(
+    r'HTTP Error (429|403|503)|Too Many Requests|timed out|Connection reset|rate.?limit',
+    re.IGNORECASE)
+
+
+class ConcurrencyLimit:
+    """Counting semaphore whose limit can be changed while it is in use."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, abort=None):
+        """Wait for a free slot; returns False if abort (an Event) got set."""
+        with self.cond:
+            while self.active >= self.limit:
+                if abort is not None and abort.is_set():
+                    return False
+                self.cond.wait(0.5)
+            self.active += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def set_limit(self, limit):
+        with self.cond:
+            self.limit = limit
+            self.cond.notify_all()
+
+
+class ThrottleLogger:
+    """yt-dlp logger that reports throttling errors to a callback.
+
+    Errors are still printed to stderr, as yt-dlp does without a logger.
+    """
+
+    def __init__(self, on_throttled):
+        self.on_throttled = on_throttled
+
+    def debug(self, msg):
+        # Retries are reported as '[download] Got error: ...' screen messages
+        if msg.startswith('[download] Got error') and THROTTLE_PATTERN.search(msg):
+            self.on_throttled(msg)
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        if THROTTLE_PATTERN.search(msg):
+            self.on_throttled(msg)
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+        if THROTTLE_PATTERN.search(msg):
+            self.on_throttled(msg)
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the download and fragment thread counts.
+
+    Every ADAPT_INTERVAL seconds it compares the aggregate throughput with the
+    previous interval:
+
+    - throttling errors: halve downloads and fragment threads
+    - the last increase brought less than ADAPT_MIN_GAIN: undo it
+    - otherwise, while every download slot is busy: one more download (or,
+      at max_downloads, one more fragment thread)
+
+    on_decision(downloads, fragments, throughput, errors, reason) is called
+    after every decision. Progress is fed with record_bytes() from the
+    progress hook, so there is no timer thread.
+    """
+
+    def __init__(self, max_downloads, max_fragments=MAX_FRAGMENT_THREADS, initial_downloads=2,
+                 initial_fragments=1, on_decision=None):
+        self.max_downloads = max_downloads
+        self.max_fragments = max_fragments
+        self.downloads = max(1, min(initial_downloads, max_downloads))
+        self.fragments = max(1, min(initial_fragments, max_fragments))
+        self.limit = ConcurrencyLimit(self.downloads)
+        self.on_decision = on_decision
+        self.lock = threading.Lock()
+        self.window_bytes = 0
+        self.window_start = time.monotonic()
+        self.errors = 0
+        self.previous_throughput = None
+        self.last_increase = None
+        self.cooldown = 0
+
+    def record_bytes(self, count):
+        """Account newly downloaded bytes (from SessionStats.update)."""
+        with self.lock:
+            self.window_bytes += count
+            decision = self.maybe_adapt()
+        if decision is not None and self.on_decision is not None:
+            self.on_decision(*decision)
+
+    def record_throttled(self, message=None):
+        """Count a throttling error; the next decision backs off."""
+        with self.lock:
+            self.errors += 1
+            decision = self.maybe_adapt()
+        if decision is not None and self.on_decision is not None:
+            self.on_decision(*decision)
+
+    def maybe_adapt(self):
+        """Decide once per interval; returns the decision or None. Called with lock held."""
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed < ADAPT_INTERVAL:
+            return None
+        throughput = self.window_bytes / elapsed
+        errors = self.errors
+        self.window_bytes = 0
+        self.errors = 0
+        self.window_start = now
+
+        if errors:
+            self.downloads = max(1, self.downloads // 2)
+            self.fragments = max(1, self.fragments // 2)
+            self.last_increase = None
+            self.cooldown = ADAPT_COOLDOWN
+            reason = 'throttled'
+        elif self.cooldown:
+            self.cooldown -= 1
+            reason = 'settling'
+        elif (self.last_increase is not None and self.previous_throughput
+              and throughput < self.previous_throughput * (1 + ADAPT_MIN_GAIN)):
+            if self.last_increase == 'downloads':
+                self.downloads = max(1, self.downloads - 1)
+            else:
+                self.fragments = max(1, self.fragments - 1)
+            self.last_increase = None
+            self.cooldown = ADAPT_COOLDOWN
+            reason = 'plateau'
+        elif self.limit.active < self.downloads:
+            # Not enough queued work to tell whether more would help
+            self.last_increase = None
+            reason = 'holding'
+        elif self.downloads < self.max_downloads:
+            self.downloads += 1
+            self.last_increase = 'downloads'
+            reason = 'probing'
+        elif self.fragments < self.max_fragments:
+            self.fragments += 1
+            self.last_increase = 'fragments'
+            reason = 'probing'
+        else:
+            self.last_increase = None
+            reason = 'at maximum'
+
+        self.previous_throughput = throughput
+        self.limit.set_limit(self.downloads)
+        return self.downloads, self.fragments, throughput, errors, reason
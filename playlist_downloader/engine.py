@@ -0,0 +1,1007 @@
+"""
+Download engine: extracts playlists and downloads their videos with yt-dlp.
+Has no GUI dependencies; progress is reported to a listener callback.
+"""
+
+import collections
+import contextlib
+import glob
+import itertools
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import yt_dlp
+
+from .accounting import SessionStats
+from .archive import (
+    ARCHIVE_FILENAME,
+    DownloadArchive,
+    PlaylistCache,
+    archive_id,
+    entry_signature,
+    playlist_sync_tag,
+)
+from .bandwidth import BandwidthLimiter
+from .concurrency import AdaptiveConcurrency, ThrottleLogger
+from .library import LibraryIndex
+from .metrics import Metrics, Profiler, serve_metrics
+from .playlist import entry_thumbnail, flat_entry, iter_playlist_entries, playlist_extra_info
+from .retry import RETRY_ATTEMPTS, RetryQueue, backoff_delay, classify_error, error_message
+from .scheduling import DownloadScheduler
+from .staging import STAGING_LIMIT, PublishStage, staging_root
+from .state import VideoStates, VideoStatus
+
+# yt-dlp format selection for each quality setting
+QUALITY_FORMATS = {
+    'highest': 'bestvideo+bestaudio/best',
+    '1080p': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
+    '720p': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
+    'audio': 'bestaudio/best',
+}
+
+# yt-dlp transfer options for each quality setting:
+# - concurrent_fragment_downloads: fragments of a DASH/HLS format fetched at once
+# - http_chunk_size: progressive formats are fetched as a series of Range
+#   requests of this size; YouTube throttles single requests that run long
+# - buffersize: initial read size, grown by yt-dlp on fast connections
+PERFORMANCE_PROFILES = {
+    'highest': {'concurrent_fragment_downloads': 8, 'http_chunk_size': 10 * 1024 * 1024, 'buffersize': 256 * 1024},
+    '1080p': {'concurrent_fragment_downloads': 6, 'http_chunk_size': 10 * 1024 * 1024, 'buffersize': 128 * 1024},
+    '720p': {'concurrent_fragment_downloads': 4, 'http_chunk_size': 10 * 1024 * 1024, 'buffersize': 64 * 1024},
+    'audio': {'concurrent_fragment_downloads': 2, 'http_chunk_size': 5 * 1024 * 1024, 'buffersize': 32 * 1024},
+}
+
+OUTPUT_TEMPLATE = '%(playlist_title)s/%(playlist_index)s - %(title)s.%(ext)s'
+
+# Info dict fields that are no longer needed once the formats are picked and
+# downloaded; dropped so finished videos waiting for ffmpeg stay small
+BULKY_INFO_FIELDS = ('formats', 'thumbnails', 'subtitles', 'automatic_captions', 'heatmap', 'description')
+
+# Number of leading playlist entries that go into a playlist's sync tag
+SYNC_TAG_ENTRIES = 30
+
+
+class DownloadPaused(yt_dlp.utils.DownloadCancelled):
+    """Raised from the progress hook to stop a download that will be resumed."""
+
+
+class DownloadStopped(yt_dlp.utils.DownloadCancelled):
+    """Raised from the progress hook to abort a download for good."""
+
+
+def remove_partial_files(paths):
+    """Delete .part files, their fragments and yt-dlp's resume state."""
+    for path in paths:
+        for partial in [path, path + '.ytdl', *glob.glob(glob.escape(path) + '-Frag*')]:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+
+
+class PostProcessStage:
+    """Runs yt-dlp post-processing (ffmpeg merges, fixups, moves) off the download workers.
+
+    At most `workers` videos are post-processed at once, each driving its own
+    ffmpeg process. At most `max_pending` more may wait; beyond that, download
+    workers block in submit() so unmerged files cannot pile up on disk.
+
+    The wait for a slot (merge_wait) and the post-processing itself (merge)
+    are timed per video when metrics are given.
+    """
+
+    def __init__(self, workers, max_pending, on_change=None, metrics=None, profiler=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="postprocess")
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.on_change = on_change
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+
+    def changed(self, queued=0, active=0):
+        with self.lock:
+            self.queued += queued
+            self.active += active
+        if self.on_change is not None:
+            self.on_change()
+
+    def submit(self, func, *args, video_id=None):
+        """Queue func(*args); blocks while the stage is full. Returns a Future."""
+        self.metrics.begin(video_id, 'merge_wait')
+        self.slots.acquire()
+        self.changed(queued=1)
+
+        def run():
+            self.changed(queued=-1, active=1)
+            self.metrics.end(video_id, 'merge_wait')
+            try:
+                with self.metrics.timed('merge', video_id), self.profiler.profiled():
+                    return func(*args)
+            finally:
+                self.changed(active=-1)
+                self.slots.release()
+
+        return self.pool.submit(run)
+
+    def shutdown(self):
+        """Wait for every queued post-processing job."""
+        self.pool.shutdown(wait=True)
+
+
+class PipelinedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL whose post-processing runs on a PostProcessStage.
+
+    The download worker is free for the next video as soon as the files are
+    downloaded. The archive entry of a video is written only once its
+    post-processing has succeeded (see DownloadEngine.download_entry).
+
+    Instances outlive a single download: reconfigure() switches them to the
+    options of the next one, keeping their HTTP connections, extractor
+    instances and the cookie jar shared by the engine.
+    """
+
+    def __init__(self, params, stage=None, cookiejar=None):
+        super().__init__(params)
+        self.stage = stage
+        self.job_params = params
+        if cookiejar is not None:
+            # Replaces yt-dlp's cached per-instance cookie jar
+            self.__dict__['cookiejar'] = cookiejar
+        self.postprocess_futures = []
+        self.deferred_archive = []
+        # While a list, the playlist entries yt-dlp left out as archived
+        self.archived_entries = None
+
+    def reconfigure(self, params):
+        """Use the options of another download (output template, format, archive)."""
+        if params is self.job_params:
+            return
+        self.job_params = params
+        params = dict(params)
+        outtmpl = params.pop('outtmpl')
+        self.params.update(params)
+        self.params['outtmpl'] = {'default': outtmpl}
+        # yt-dlp parses these two once, when the instance is created
+        self.format_selector = self.build_format_selector(self.params['format'])
+        self.archive = params['download_archive'] if params.get('download_archive') is not None else set()
+
+    def in_download_archive(self, info_dict):
+        archived = super().in_download_archive(info_dict)
+        if archived and self.archived_entries is not None:
+            self.archived_entries.append({key: info_dict.get(key) for key in (
+                'id', 'title', 'playlist_index', 'thumbnail', 'thumbnails')})
+        return archived
+
+    def post_process(self, filename, info, files_to_move=None):
+        if self.stage is None:
+            return super().post_process(filename, info, files_to_move)
+        # process_info keeps editing its info dict, so the stage gets a copy
+        job = dict(info)
+        info['filepath'] = filename
+        self.postprocess_futures.append(
+            self.stage.submit(super().post_process, filename, job, files_to_move, video_id=info.get('id')))
+        return info
+
+    def record_download_archive(self, info_dict):
+        if self.postprocess_futures:
+            self.deferred_archive.append(info_dict)
+        else:
+            super().record_download_archive(info_dict)
+
+
+class DownloadEngine:
+    """Downloads playlists and single videos into output_dir.
+
+    listener(event, data) is called with progress events, from the calling
+    thread and from the download worker threads:
+
+    - extracting {url}
+    - playlist {playlist_id, title}
+    - unchanged {playlist_id}: sync found the playlist as it was last time
+    - video {video_id, title, index, thumbnail}: an entry was listed
+    - started {streaming}: downloads are being queued
+    - listed {count, new}: the playlist listing is complete (new is None
+      unless syncing)
+    - downloading {video_id, downloaded_bytes, total_bytes, speed, eta,
+      video_downloaded_bytes, video_total_bytes, session}: progress of one
+      file, of its video (all formats) and the SessionStats.snapshot()
+    - finished {video_id, total_bytes}: a file is downloaded, merging may follow
+    - stats {session, videos}: a video finished, failed or was cancelled;
+      videos is self.videos.counts()
+    - done {video_id}: downloaded and post-processed
+    - retrying {video_id, reason, attempt, attempts, delay}: a transient
+      error; the video is downloaded again (attempt of attempts) after
+      delay seconds
+    - failed {video_id, reason, kind, attempts}: kind is 'permanent' or
+      'transient' (retries used up); the video is listed in self.failed
+    - skipped {video_id, reason, method}: reason is 'archived', or 'library'
+      when the file was linked from the library (method is 'hardlink',
+      'reflink' or 'symlink')
+    - queues {download_queued, downloading, postprocess_queued, postprocessing,
+      publish_queued, publishing}
+    - paused {} / resumed {}
+    - concurrency {downloads, fragments, throughput, errors, reason}: a
+      decision of the adaptive controller (only with adaptive=True)
+    - ratelimit {limit}: the bandwidth limit in effect changed (bytes per
+      second, None when unlimited)
+    - cancelled {video_id}: the download was stopped and its partial files
+      removed, or it was dropped from the queue
+
+    The constructor options are described in the README (Command line /
+    library use).
+    """
+
+    def __init__(self, output_dir, quality='highest', max_workers=3, stream=True, sync=False,
+                 listener=None, postprocess_workers=2, max_pending_postprocess=4, adaptive=False,
+                 schedule='playlist', retry_attempts=RETRY_ATTEMPTS, library=None, link_mode='auto',
+                 rate_limit=None, rate_schedule=None, staging_dir=None, publish_workers=2,
+                 max_staged_bytes=STAGING_LIMIT):
+        self.output_dir = output_dir
+        self.quality = quality
+        self.max_workers = max_workers
+        self.stream = stream
+        self.sync = sync
+        self.listener = listener
+        self.archive = None
+        self.playlist_cache = None
+        self.worker_local = threading.local()
+        self.worker_ydls = []
+        self.worker_lock = threading.Lock()
+        self.download_pool = None
+        self.shared_ydls = {}
+        self.cookiejar = None
+        self.postprocess_workers = postprocess_workers
+        self.max_pending_postprocess = max_pending_postprocess
+        self.postprocess_stage = None
+        self.staging_dir = staging_dir
+        self.publish_workers = publish_workers
+        self.max_staged_bytes = max_staged_bytes
+        self.publish_stage = None
+        self.download_queued = 0
+        self.downloading = 0
+        self.running = threading.Event()
+        self.running.set()
+        self.cancelled = threading.Event()
+        self.partial_files = {}
+        self.adaptive = adaptive
+        self.schedule = schedule
+        self.retry_attempts = max(1, retry_attempts)
+        self.retries = RetryQueue()
+        self.attempts = {}
+        self.failed = []
+        self.library = None
+        if library is not None:
+            self.library = LibraryIndex(library, link_mode)
+            # Files whose hashing an earlier run left unfinished
+            self.library.resume_hashing()
+        self.concurrency = None
+        self.stats = SessionStats()
+        self.videos = VideoStates()
+        self.metrics = Metrics(gauges=self.gauges)
+        self.profiler = Profiler()
+        self.metrics_server = None
+        self.bandwidth = BandwidthLimiter(rate_limit, rate_schedule, on_change=self.rate_limit_changed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker threads and close every YoutubeDL (and its connections).
+
+        They are kept between download() calls until then."""
+        if self.download_pool is not None:
+            self.download_pool.shutdown(wait=True)
+            self.download_pool = None
+        for ydl in [*self.worker_ydls, *self.shared_ydls.values()]:
+            ydl.close()
+        self.worker_ydls = []
+        self.shared_ydls = {}
+        self.worker_local = threading.local()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+        if self.library is not None:
+            self.library.close()
+            self.library = None
+
+    def serve_metrics(self, port=0):
+        """Serve /metrics (Prometheus), /metrics.json and /profile/start|stop on
+        127.0.0.1 until close(); returns the port."""
+        if self.metrics_server is None:
+            self.metrics_server = serve_metrics(self.metrics, self.profiler, port)
+        return self.metrics_server.server_address[1]
+
+    def gauges(self):
+        """Current values exported next to the counters."""
+        session = self.stats.snapshot()
+        return {
+            'session_downloaded_bytes': session['downloaded_bytes'],
+            'session_total_bytes': session['total_bytes'],
+            'session_speed_bytes_per_second': session['speed'],
+            'session_videos_finished': session['videos_finished'],
+            'session_videos_total': session['videos_total'],
+            'downloads_active': self.downloading,
+            'downloads_queued': self.download_queued,
+            'staging_bytes': self.publish_stage.staged_bytes if self.publish_stage else 0,
+            'rate_limit_bytes_per_second': self.bandwidth.limit or 0,
+            **{f'videos_{status}': count for status, count in self.videos.counts().items()},
+        }
+
+    def emit(self, event, **data):
+        """Send an event to the listener."""
+        self.metrics.count('events', event)
+        self.videos.record(event, data)
+        if self.listener is not None:
+            self.listener(event, data)
+
+    def pause(self):
+        """Stop downloading at the next progress tick, keeping partial files."""
+        if not self.cancelled.is_set() and self.running.is_set():
+            self.running.clear()
+            self.emit('paused')
+
+    def resume(self):
+        """Continue paused downloads from their .part files."""
+        if not self.cancelled.is_set() and not self.running.is_set():
+            self.running.set()
+            self.emit('resumed')
+
+    def cancel(self):
+        """Stop every download, drop queued ones and remove their partial files."""
+        self.cancelled.set()
+        # Wake workers waiting on a pause so they can exit
+        self.running.set()
+
+    @property
+    def paused(self):
+        return not self.running.is_set()
+
+    def throttled(self, message):
+        """ThrottleLogger callback: the server pushed back on a request."""
+        if self.concurrency is not None:
+            self.concurrency.record_throttled(message)
+
+    def concurrency_decided(self, downloads, fragments, throughput, errors, reason):
+        self.emit('concurrency', downloads=downloads, fragments=fragments,
+                  throughput=throughput, errors=errors, reason=reason)
+
+    def rate_limit_changed(self, limit):
+        self.emit('ratelimit', limit=limit)
+
+    def build_ydl_opts(self):
+        """yt-dlp options shared by every YoutubeDL the engine creates."""
+        ydl_opts = {
+            'format': QUALITY_FORMATS.get(self.quality, QUALITY_FORMATS['highest']),
+            'outtmpl': os.path.join(self.download_dir(), OUTPUT_TEMPLATE),
+            'merge_output_format': 'mp4' if self.quality != 'audio' else 'm4a',
+            'ignoreerrors': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'progress_hooks': [self.progress_hook],
+            'download_archive': self.archive,
+            # Resume existing .part files instead of starting over
+            'continuedl': True,
+            **PERFORMANCE_PROFILES.get(self.quality, PERFORMANCE_PROFILES['highest']),
+        }
+        if self.adaptive:
+            ydl_opts['logger'] = ThrottleLogger(self.throttled)
+        return ydl_opts
+
+    def download_dir(self):
+        """Where yt-dlp writes: the staging directory of output_dir, or output_dir."""
+        if self.staging_dir is None:
+            return self.output_dir
+        return staging_root(self.staging_dir, self.output_dir)
+
+    def published_path(self, path):
+        """Place in output_dir of a file yt-dlp wrote to the staging directory."""
+        if self.staging_dir is None:
+            return path
+        return os.path.join(self.output_dir, os.path.relpath(path, self.download_dir()))
+
+    def download(self, url, output_dir=None, quality=None):
+        """Download a playlist or video URL; returns when every entry is done.
+
+        output_dir and quality replace the engine's settings from this call on.
+        """
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if quality is not None:
+            self.quality = quality
+        self.failed = []
+        self.videos = VideoStates()
+        with self.output_archive():
+            ydl_opts = self.build_ydl_opts()
+            if self.sync:
+                self.stream_and_download(url, ydl_opts, sync=True)
+            elif self.stream:
+                self.stream_and_download(url, ydl_opts)
+            else:
+                self.extract_and_download(url, ydl_opts)
+
+    def retry_failed(self, failed=None):
+        """Download the videos that failed in the last download() again, without
+        listing their playlist. failed defaults to self.failed."""
+        failed = self.failed if failed is None else failed
+        self.failed = []
+        with self.output_archive():
+            self.emit('started', streaming=False)
+            self.download_entries([(entry, extra_info) for entry, extra_info, *_ in failed],
+                                  self.build_ydl_opts())
+
+    @contextlib.contextmanager
+    def output_archive(self):
+        """Open the download archive and playlist cache of output_dir."""
+        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        self.archive = DownloadArchive(os.path.join(self.output_dir, ARCHIVE_FILENAME))
+        self.playlist_cache = PlaylistCache(os.path.join(self.output_dir, ARCHIVE_FILENAME))
+        try:
+            yield
+        finally:
+            self.archive.close()
+            self.archive = None
+            self.playlist_cache.close()
+            self.playlist_cache = None
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook: forward download progress as events."""
+        info_dict = d.get('info_dict', {})
+        video_id = info_dict.get('id', '')
+        self.metrics.count('hooks', d['status'])
+        if d['status'] == 'downloading':
+            if d.get('tmpfilename'):
+                with self.worker_lock:
+                    self.partial_files.setdefault(video_id, set()).add(d['tmpfilename'])
+            # Raising here unwinds yt-dlp's downloader, which closes the connection
+            if self.cancelled.is_set():
+                raise DownloadStopped('Download cancelled')
+            if not self.running.is_set():
+                raise DownloadPaused('Download paused')
+            # Extraction and format selection end with the first progress tick
+            self.metrics.end(video_id, 'resolve')
+            self.metrics.begin(video_id, 'transfer')
+            downloaded_bytes = d.get('downloaded_bytes') or 0
+            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            new_bytes = self.stats.update(video_id, info_dict.get('format_id'), downloaded_bytes, total_bytes)
+            if self.concurrency is not None:
+                self.concurrency.record_bytes(new_bytes)
+            video_downloaded_bytes, video_total_bytes = self.stats.video(video_id)
+            self.emit('downloading', video_id=video_id,
+                      downloaded_bytes=downloaded_bytes, total_bytes=total_bytes,
+                      speed=d.get('speed'), eta=d.get('eta'),
+                      video_downloaded_bytes=video_downloaded_bytes,
+                      video_total_bytes=video_total_bytes,
+                      session=self.stats.snapshot())
+            # Sleeping here holds back this download's next read
+            self.bandwidth.consume(new_bytes, abort=self.cancelled)
+        elif d['status'] == 'finished':
+            self.metrics.end(video_id, 'transfer')
+            filename = d.get('filename')
+            if filename and f".f{info_dict.get('format_id')}." in os.path.basename(filename):
+                # One format of a video that is still to be merged
+                with self.worker_lock:
+                    self.partial_files.setdefault(video_id, set()).add(filename)
+            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            # A file already complete on disk has no progress before this call;
+            # none of its bytes were transferred in this session
+            if self.stats.has_file(video_id, info_dict.get('format_id')):
+                self.stats.update(video_id, info_dict.get('format_id'),
+                                  total_bytes or d.get('downloaded_bytes') or 0, total_bytes)
+            if self.publish_stage is not None:
+                self.publish_stage.add(video_id, total_bytes or d.get('downloaded_bytes') or 0)
+            self.emit('finished', video_id=video_id, total_bytes=total_bytes)
+
+    def queues_changed(self, queued=0, active=0):
+        """Update the download counters and report all stage queue depths."""
+        with self.worker_lock:
+            self.download_queued += queued
+            self.downloading += active
+            download_queued, downloading = self.download_queued, self.downloading
+        stage, publish_stage = self.postprocess_stage, self.publish_stage
+        self.emit('queues', download_queued=download_queued, downloading=downloading,
+                  postprocess_queued=stage.queued if stage else 0,
+                  postprocessing=stage.active if stage else 0,
+                  publish_queued=publish_stage.queued if publish_stage else 0,
+                  publishing=publish_stage.active if publish_stage else 0)
+
+    def new_ydl(self, ydl_opts, stage=None):
+        """Create a YoutubeDL that shares the engine's cookie jar."""
+        # yt-dlp edits its params in place, so every instance gets a copy
+        ydl = PipelinedYoutubeDL(dict(ydl_opts), stage, cookiejar=self.cookiejar)
+        ydl.job_params = ydl_opts
+        with self.worker_lock:
+            if self.cookiejar is None:
+                self.cookiejar = ydl.cookiejar
+        return ydl
+
+    def get_worker_ydl(self, ydl_opts):
+        """Return the YoutubeDL instance owned by the current worker thread."""
+        ydl = getattr(self.worker_local, 'ydl', None)
+        if ydl is None:
+            ydl = self.new_ydl(ydl_opts, self.postprocess_stage)
+            self.worker_local.ydl = ydl
+            with self.worker_lock:
+                self.worker_ydls.append(ydl)
+        else:
+            ydl.stage = self.postprocess_stage
+            ydl.reconfigure(ydl_opts)
+        return ydl
+
+    def get_shared_ydl(self, name, ydl_opts):
+        """Return the engine's YoutubeDL for one purpose ('listing', 'extract')."""
+        ydl = self.shared_ydls.get(name)
+        if ydl is None:
+            ydl = self.shared_ydls[name] = self.new_ydl(ydl_opts)
+        else:
+            ydl.reconfigure(ydl_opts)
+        return ydl
+
+    def download_entry(self, entry, ydl_opts, extra_info=None):
+        """Download an extracted entry without re-extracting the playlist."""
+        video_id = entry.get('id', '')
+        # Queued downloads wait here while paused, without holding a connection
+        self.running.wait()
+        if self.publish_stage is not None:
+            # Back-pressure: the staging directory is full until publishing catches up
+            self.publish_stage.wait_for_space(abort=self.cancelled)
+        limit = self.concurrency.limit if self.concurrency is not None else None
+        if self.cancelled.is_set() or (limit is not None and not limit.acquire(abort=self.cancelled)):
+            self.queues_changed(queued=-1)
+            if video_id:
+                self.emit('cancelled', video_id=video_id)
+            self.video_finished(video_id, completed=False)
+            return
+        self.queues_changed(queued=-1, active=1)
+        self.metrics.end(video_id, 'queue_wait')
+        ydl = self.get_worker_ydl(ydl_opts)
+        try:
+            with self.profiler.profiled():
+                while True:
+                    if self.concurrency is not None:
+                        # Read by yt-dlp when the downloader for this video is created
+                        ydl.params['concurrent_fragment_downloads'] = self.concurrency.fragments
+                    self.metrics.begin(video_id, 'resolve')
+                    try:
+                        info = ydl.process_ie_result(dict(entry), download=True, extra_info=extra_info or {})
+                        # Files that were already complete get no progress ticks
+                        self.metrics.end(video_id, 'resolve')
+                        break
+                    except DownloadPaused:
+                        self.metrics.end(video_id, 'transfer')
+                        # continuedl picks up the .part file once resumed
+                        self.running.wait()
+                        if not self.cancelled.is_set():
+                            continue
+                        self.discard_partial_download(video_id)
+                        return
+                    except DownloadStopped:
+                        self.discard_partial_download(video_id)
+                        return
+        except yt_dlp.utils.DownloadError as e:
+            self.download_failed(entry, extra_info, str(e))
+            return
+        finally:
+            futures, ydl.postprocess_futures = ydl.postprocess_futures, []
+            deferred_archive, ydl.deferred_archive = ydl.deferred_archive, []
+            self.queues_changed(active=-1)
+            if limit is not None:
+                limit.release()
+            with self.worker_lock:
+                self.partial_files.pop(video_id, None)
+        if info is None:
+            # Nothing was downloaded, and yt-dlp did not say why
+            self.download_failed(entry, extra_info, "yt-dlp returned no video information")
+            return
+        for field in BULKY_INFO_FIELDS:
+            info.pop(field, None)
+        self.when_postprocessed(ydl, flat_entry(entry), extra_info, info, futures, deferred_archive)
+
+    def download_next(self, scheduler, ydl_opts):
+        """Download the entry the scheduler picks next."""
+        entry, extra_info = scheduler.pop()
+        self.download_entry(entry, ydl_opts, extra_info)
+
+    def download_failed(self, entry, extra_info, message, kind=None):
+        """Queue a retry of a failed download if the error is transient, else report the failure."""
+        video_id = entry.get('id', '')
+        # Kept until retried; a retry extracts the video again anyway
+        entry = flat_entry(entry)
+        message = error_message(message)
+        kind = kind or classify_error(message)
+        with self.worker_lock:
+            attempt = self.attempts.get(video_id, 1)
+            retry = kind == 'transient' and attempt < self.retry_attempts and not self.cancelled.is_set()
+            if retry:
+                self.attempts[video_id] = attempt + 1
+            else:
+                self.failed.append((entry, extra_info, message, kind))
+        if retry:
+            delay = backoff_delay(attempt)
+            self.metrics.count('retries')
+            self.retries.add(entry, extra_info, delay)
+            if video_id:
+                self.emit('retrying', video_id=video_id, reason=message, attempt=attempt + 1,
+                          attempts=self.retry_attempts, delay=delay)
+            return
+        if video_id:
+            self.emit('failed', video_id=video_id, reason=message, kind=kind, attempts=attempt)
+        self.video_finished(video_id, completed=False)
+
+    def discard_partial_download(self, video_id):
+        """Remove what a cancelled download left behind."""
+        with self.worker_lock:
+            paths = self.partial_files.pop(video_id, set())
+        remove_partial_files(paths)
+        if video_id:
+            self.emit('cancelled', video_id=video_id)
+        self.video_finished(video_id, completed=False)
+
+    def video_finished(self, video_id, completed):
+        """Account a video that will not make more progress and report the totals."""
+        self.stats.finish_video(video_id, completed)
+        if self.publish_stage is not None:
+            self.publish_stage.release(video_id)
+        self.metrics.end(video_id, 'total')
+        self.metrics.forget(video_id)
+        self.metrics.count('videos', 'completed' if completed else 'failed')
+        self.emit('stats', session=self.stats.snapshot(), videos=self.videos.counts())
+
+    def when_postprocessed(self, ydl, entry, extra_info, info, futures, deferred_archive):
+        """Finish a video once all of its post-processing jobs are done."""
+        video_id = entry.get('id', '')
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        downloads = info.get('requested_downloads') or [{}]
+
+        def finish():
+            errors = [str(f.exception()) for f in futures if f.exception() is not None]
+            if errors:
+                # The download itself worked; ffmpeg or the move failed
+                self.download_failed(entry, extra_info, errors[0], kind='permanent')
+                return
+            path = downloads[0].get('filepath') or info.get('filepath')
+            if self.publish_stage is None or not path:
+                record()
+                return
+            target = self.published_path(path)
+            future = self.publish_stage.submit([(path, target)], video_id=video_id)
+            future.add_done_callback(lambda future: published(future, target))
+
+        def published(future, target):
+            if future.exception() is not None:
+                # Still in staging: a retry finds it there and only publishes it
+                self.download_failed(entry, extra_info, str(future.exception()), kind='permanent')
+                return
+            downloads[0]['filepath'] = info['filepath'] = target
+            record()
+
+        def record():
+            for archived in deferred_archive:
+                yt_dlp.YoutubeDL.record_download_archive(ydl, archived)
+            if self.archive is not None:
+                self.archive.record_download(info, self.quality)
+            if self.library is not None:
+                self.library.add(archive_id(entry) or archive_id(info),
+                                 downloads[0].get('filepath') or info.get('filepath'), info.get('format_id'),
+                                 self.quality)
+            if video_id:
+                self.emit('done', video_id=video_id)
+            self.video_finished(video_id, completed=True)
+
+        def job_done(future):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                finish()
+
+        if not futures:
+            finish()
+        for future in futures:
+            future.add_done_callback(job_done)
+
+    def download_entries(self, entries, ydl_opts):
+        """Download (entry, extra_info) pairs concurrently, one YoutubeDL per worker thread.
+
+        entries may be a generator: each entry is queued as soon as it is yielded.
+        Transient failures are queued again once their backoff has passed.
+        """
+        self.stats = SessionStats()
+        self.retries = RetryQueue()
+        self.attempts = {}
+        # Workers need yt-dlp's errors, to tell transient ones from permanent ones
+        worker_opts = dict(ydl_opts, ignoreerrors=False)
+        self.postprocess_stage = PostProcessStage(self.postprocess_workers, self.max_pending_postprocess,
+                                                  on_change=self.queues_changed, metrics=self.metrics,
+                                                  profiler=self.profiler)
+        if self.staging_dir is not None:
+            self.publish_stage = PublishStage(self.publish_workers, self.max_staged_bytes,
+                                              on_change=self.queues_changed, metrics=self.metrics)
+        scheduler = DownloadScheduler(self.schedule, self.quality)
+        if self.adaptive:
+            profile = PERFORMANCE_PROFILES.get(self.quality, PERFORMANCE_PROFILES['highest'])
+            self.concurrency = AdaptiveConcurrency(
+                self.max_workers, initial_fragments=profile['concurrent_fragment_downloads'],
+                on_decision=self.concurrency_decided)
+        if self.download_pool is None:
+            self.download_pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="download")
+        futures = []
+        try:
+            # Output names come from each entry's playlist_index, so the
+            # order in which workers pick or finish entries does not matter.
+            for entry, extra_info in self.metrics.timed_iter('listing', entries):
+                if self.cancelled.is_set():
+                    break
+                if self.already_downloaded(entry, extra_info, worker_opts):
+                    continue
+                video_id = entry.get('id', '')
+                self.metrics.begin(video_id, 'total')
+                self.stats.add_video(video_id)
+                futures.append(self.queue_download(scheduler, entry, extra_info, worker_opts))
+            futures = self.run_retries(scheduler, worker_opts, futures)
+        finally:
+            wait(futures)
+            # Cancelled: retries still waiting for their backoff will not run
+            for entry, _ in self.retries.drain():
+                if entry.get('id'):
+                    self.emit('cancelled', video_id=entry['id'])
+                self.video_finished(entry.get('id', ''), completed=False)
+            # Workers are done downloading; let the last merges finish before
+            # the next download reconfigures their YoutubeDL instances.
+            self.postprocess_stage.shutdown()
+            # Finished merges queue their files for publishing
+            if self.publish_stage is not None:
+                self.publish_stage.shutdown()
+
+    def entry_path(self, entry, extra_info, ext, ydl_opts):
+        """Where in output_dir this playlist puts the file of an entry."""
+        filename = self.get_shared_ydl('filenames', ydl_opts).prepare_filename(
+            {**entry, **(extra_info or {}), 'ext': ext})
+        return os.path.abspath(self.published_path(filename))
+
+    def already_downloaded(self, entry, extra_info, ydl_opts):
+        """Whether an entry needs no download: it is archived in output_dir, or
+        else could be linked from the library.
+
+        Decided from the archive and the library index; the only file system
+        access is for a video about to be linked to a new place.
+        """
+        video_id = entry.get('id', '')
+        key = archive_id(entry)
+        if key is not None and key in self.archive:
+            # Finished in an earlier run: no request for this entry at all.
+            # Checked first, as its name changes when the playlist is reordered
+            # and the library would link it again under the new name.
+            if video_id:
+                self.emit('skipped', video_id=video_id, reason='archived')
+            return True
+        # Only a file of the requested quality will do; otherwise it is downloaded
+        item = self.library.lookup(key, self.quality) if self.library is not None else None
+        if item is not None:
+            target = self.entry_path(entry, extra_info, os.path.splitext(item.path)[1][1:], ydl_opts)
+            # A copy the user deleted is not linked again
+            if not self.library.has_copy(target) and not os.path.exists(target):
+                try:
+                    method = self.library.link(item, target)
+                except OSError:
+                    pass
+                else:
+                    self.archive.add(key)
+                    self.archive.record_download({**entry, 'filepath': target, 'format_id': item.format_id,
+                                                  'filesize': item.size}, self.quality)
+                    self.metrics.count('linked', method)
+                    if video_id:
+                        self.emit('skipped', video_id=video_id, reason='library', method=method)
+                    return True
+        return False
+
+    def queue_download(self, scheduler, entry, extra_info, ydl_opts):
+        """Hand an entry to the scheduler and start a task for it; returns the Future."""
+        video_id = entry.get('id', '')
+        self.metrics.begin(video_id, 'queue_wait')
+        if video_id:
+            self.videos.set_status(video_id, VideoStatus.QUEUED)
+        self.queues_changed(queued=1)
+        scheduler.add(entry, extra_info)
+        # Each task downloads whichever entry the scheduler picks when it starts
+        return self.download_pool.submit(self.download_next, scheduler, ydl_opts)
+
+    def run_retries(self, scheduler, ydl_opts, futures):
+        """Queue retries as their backoff passes, until no download is running or waiting.
+
+        Returns the futures still running when cancelled.
+        """
+        while not self.cancelled.is_set():
+            futures = [future for future in futures if not future.done()]
+            delay = self.retries.next_delay()
+            if delay is None and not futures:
+                break
+            if delay == 0:
+                entry, extra_info = self.retries.pop()
+                futures.append(self.queue_download(scheduler, entry, extra_info, ydl_opts))
+            elif futures:
+                # A finishing download may queue a retry that is due sooner
+                wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+            else:
+                self.cancelled.wait(delay)
+        return futures
+
+    def extract_and_download(self, url, ydl_opts):
+        """Resolve the whole playlist first, then download the resolved entries."""
+        ydl = self.get_shared_ydl('extract', ydl_opts)
+        self.emit('extracting', url=url)
+        ydl.archived_entries = []
+        try:
+            with self.metrics.timed('extract'):
+                info = ydl.extract_info(url, download=False)
+        finally:
+            archived, ydl.archived_entries = ydl.archived_entries, None
+        if info is None:
+            raise RuntimeError("Could not extract playlist info")
+
+        # Keep the resolved entries: they are downloaded below without
+        # asking the extractor about the playlist or its videos again.
+        entries = collections.deque([info])
+        skipped = []
+        if 'entries' in info:
+            self.emit('playlist', playlist_id=info.get('id'),
+                      title=info.get('title', 'Unknown Playlist'))
+            entries = collections.deque(e for e in info.pop('entries') if e)
+            # yt-dlp leaves out archived entries; they are listed as skipped
+            archived = list({entry['id']: entry for entry in archived if entry.get('id')}.values())
+            listing = sorted([*entries, *archived], key=lambda entry: entry.get('playlist_index') or 0)
+            for idx, entry in enumerate(listing, 1):
+                video_id = entry.get('id', f'video_{idx}')
+                self.emit('video', video_id=video_id, title=entry.get('title') or 'Unknown Title',
+                          index=entry.get('playlist_index') or idx, thumbnail=entry_thumbnail(entry))
+            self.emit('listed', count=len(listing), new=None)
+            skipped = [entry['id'] for entry in archived]
+
+        self.emit('started', streaming=False)
+        for video_id in skipped:
+            self.emit('skipped', video_id=video_id, reason='archived')
+        # Popped as they are queued, so each info dict is freed once its video is done
+        self.download_entries(((entries.popleft(), None) for _ in range(len(entries))), ydl_opts)
+
+    def stream_and_download(self, url, ydl_opts, sync=False):
+        """Download entries while the playlist pages are still being fetched.
+
+        With sync, entries are diffed against the cached listing of the playlist.
+        """
+        # Flat, lazy extraction only lists the entries; each worker resolves
+        # its own video, so full info dicts are never all held at once.
+        flat_opts = dict(ydl_opts, extract_flat='in_playlist', lazy_playlist=True)
+        ydl = self.get_shared_ydl('listing', flat_opts)
+        self.emit('extracting', url=url)
+        with self.metrics.timed('extract'):
+            info = ydl.extract_info(url, download=False, process=False)
+            while info and info.get('_type') in ('url', 'url_transparent'):
+                info = ydl.extract_info(info['url'], download=False, process=False,
+                                        ie_key=info.get('ie_key'))
+        if info is None:
+            raise RuntimeError("Could not extract playlist info")
+
+        self.emit('started', streaming=True)
+        entries = self.sync_entries(info, ydl_opts) if sync else self.stream_entries(info)
+        self.download_entries(entries, ydl_opts)
+
+    def list_entry(self, entry, idx):
+        """Announce a listed entry; returns its video id."""
+        video_id = entry.get('id', f'video_{idx}')
+        self.emit('video', video_id=video_id, title=entry.get('title') or 'Unknown Title',
+                  index=idx, thumbnail=entry_thumbnail(entry))
+        return video_id
+
+    def stream_entries(self, info):
+        """Yield (entry, extra_info) pairs as the playlist pages arrive."""
+        if 'entries' not in info:
+            yield info, None
+            return
+
+        self.emit('playlist', playlist_id=info.get('id'),
+                  title=info.get('title') or 'Unknown Playlist')
+
+        video_count = 0
+        for idx, entry in enumerate(iter_playlist_entries(info['entries']), 1):
+            if not entry:
+                continue
+            video_count += 1
+            self.list_entry(entry, idx)
+            yield entry, playlist_extra_info(info, idx)
+
+        self.emit('listed', count=video_count, new=None)
+
+    def refresh_entry(self, key, cached, entry, extra_info, ydl_opts):
+        """Bring an archived entry that changed since the last sync up to date.
+
+        A new title only renames its file. A new duration means the video was
+        replaced: its file is removed and it is downloaded again (returns True).
+        """
+        path = self.archive.filepath(key)
+        durations = [None if e.get('duration') is None else round(e['duration']) for e in (cached, entry)]
+        if durations[0] != durations[1]:
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self.library is not None:
+                self.library.forget(key)
+            self.archive.forget(key)
+            return True
+
+        if path is None or not os.path.exists(path):
+            return False
+        target = self.entry_path(entry, extra_info, os.path.splitext(path)[1][1:], ydl_opts)
+        if target == os.path.abspath(path) or os.path.exists(target):
+            return False
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        except OSError:
+            return False
+        self.archive.move(key, target)
+        if self.library is not None:
+            self.library.move(path, target)
+        return False
+
+    def sync_entries(self, info, ydl_opts):
+        """Yield the entries of a playlist; archived ones that changed are refreshed
+        (see refresh_entry).
+
+        The listing is cached per playlist id; when the playlist's sync tag is
+        unchanged the cached listing is used and no further pages are fetched.
+        """
+        playlist_id = info.get('id')
+        if 'entries' not in info or not playlist_id:
+            yield from self.stream_entries(info)
+            return
+
+        playlist_title = info.get('title') or 'Unknown Playlist'
+        self.emit('playlist', playlist_id=playlist_id, title=playlist_title)
+
+        cached_tag, cached_entries = self.playlist_cache.load(playlist_id)
+        cached = {entry['id']: entry for _, entry in cached_entries}
+
+        listing = enumerate(iter_playlist_entries(info['entries']), 1)
+        head = list(itertools.islice(listing, SYNC_TAG_ENTRIES))
+        sync_tag = playlist_sync_tag(info, [entry for _, entry in head])
+        unchanged = cached_tag == sync_tag
+        if unchanged:
+            self.emit('unchanged', playlist_id=playlist_id)
+            listing = cached_entries
+        else:
+            listing = itertools.chain(head, listing)
+
+        seen = []
+        video_count = new_count = 0
+        for idx, entry in listing:
+            if not entry:
+                continue
+            video_count += 1
+            video_id = self.list_entry(entry, idx)
+            seen.append((idx, {key: entry.get(key) for key in ('id', 'ie_key', 'url', 'title', 'duration')}))
+
+            key = archive_id(entry)
+            extra_info = playlist_extra_info(info, idx)
+            if video_id not in cached:
+                new_count += 1
+            elif entry_signature(cached[video_id]) != entry_signature(entry) and key in self.archive:
+                if self.refresh_entry(key, cached[video_id], entry, extra_info, ydl_opts):
+                    new_count += 1
+            yield entry, extra_info
+
+        if not unchanged:
+            self.playlist_cache.store(playlist_id, playlist_title, sync_tag, seen)
+        self.emit('listed', count=video_count, new=new_count)
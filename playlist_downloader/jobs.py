@@ -0,0 +1,187 @@
+"""
+Persistent job queue: playlist and video URLs waiting to be downloaded.
+Jobs are kept in SQLite so a queue survives restarts, and run one after the
+other on a single DownloadEngine, which keeps its worker threads, YoutubeDL
+instances, cookies and HTTP connections from one job to the next.
+"""
+
+import collections
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .paths import user_data_dir
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+Job = collections.namedtuple(
+    'Job', 'job_id url output_dir quality priority status title error added')
+
+
+def default_queue_path():
+    """Per-user location of the job queue database."""
+    return user_data_dir() / "jobs.sqlite3"
+
+
+class JobQueue:
+    """Download jobs ordered by priority (highest first), then queue position.
+
+    Safe to use from several threads. Jobs left 'running' by a previous
+    process are queued again when the queue is opened.
+    """
+
+    def __init__(self, path):
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' job_id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' url TEXT NOT NULL,'
+            ' output_dir TEXT NOT NULL,'
+            ' quality TEXT NOT NULL,'
+            ' priority INTEGER NOT NULL DEFAULT 0,'
+            ' position REAL NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' title TEXT,'
+            ' error TEXT,'
+            ' added REAL,'
+            ' updated REAL)'
+        )
+        self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self._conn.commit()
+
+    def add(self, url, output_dir, quality='highest', priority=0):
+        """Append a job; returns its id."""
+        with self._lock:
+            position = self._conn.execute('SELECT COALESCE(MAX(position), 0) + 1 FROM jobs').fetchone()[0]
+            now = time.time()
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (url, output_dir, quality, priority, position, status, added, updated) '
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (url, str(output_dir), quality, priority, position, now, now))
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def jobs(self, statuses=('queued', 'running', 'failed', 'cancelled')):
+        """Jobs with the given statuses, running first, then in the order they will run."""
+        marks = ','.join('?' * len(statuses))
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT job_id, url, output_dir, quality, priority, status, title, error, added FROM jobs '
+                f'WHERE status IN ({marks}) '
+                "ORDER BY status != 'running', priority DESC, position, job_id", statuses).fetchall()
+        return [Job(*row) for row in rows]
+
+    def claim_next(self):
+        """Mark the next queued job as running and return it, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT job_id FROM jobs WHERE status = ? ORDER BY priority DESC, position, job_id LIMIT 1',
+                ('queued',)).fetchone()
+            if row is None:
+                return None
+            self._set(row[0], status='running')
+            self._conn.commit()
+        return self.get(row[0])
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT job_id, url, output_dir, quality, priority, status, title, error, added FROM jobs '
+                'WHERE job_id = ?', (job_id,)).fetchone()
+        return Job(*row) if row else None
+
+    def finish(self, job_id, status, error=None):
+        """Record the outcome of a job ('done', 'failed', 'cancelled' or back to 'queued')."""
+        if status not in JOB_STATUSES:
+            raise ValueError(f"unknown job status: {status}")
+        with self._lock:
+            self._set(job_id, status=status, error=error)
+            self._conn.commit()
+
+    def set_title(self, job_id, title):
+        with self._lock:
+            self._set(job_id, title=title)
+            self._conn.commit()
+
+    def set_priority(self, job_id, priority):
+        with self._lock:
+            self._set(job_id, priority=priority)
+            self._conn.commit()
+
+    def retry(self, job_id):
+        """Queue a failed or cancelled job again, at the end of its priority."""
+        with self._lock:
+            position = self._conn.execute('SELECT COALESCE(MAX(position), 0) + 1 FROM jobs').fetchone()[0]
+            self._set(job_id, status='queued', error=None, position=position)
+            self._conn.commit()
+
+    def move(self, job_id, offset):
+        """Move a queued job up (negative offset) or down among jobs of its priority."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT priority FROM jobs WHERE job_id = ? AND status = 'queued'", (job_id,)).fetchone()
+            if row is None:
+                return
+            order = [job for job, in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' AND priority = ? ORDER BY position, job_id",
+                (row[0],))]
+            index = order.index(job_id)
+            target = max(0, min(len(order) - 1, index + offset))
+            if target == index:
+                return
+            order.insert(target, order.pop(index))
+            positions = sorted(position for position, in self._conn.execute(
+                'SELECT position FROM jobs WHERE job_id IN ({})'.format(','.join('?' * len(order))), order))
+            self._conn.executemany('UPDATE jobs SET position = ? WHERE job_id = ?', zip(positions, order))
+            self._conn.commit()
+
+    def remove(self, job_id):
+        """Drop a job that is not running."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ? AND status != 'running'", (job_id,))
+            self._conn.commit()
+
+    def _set(self, job_id, **fields):
+        """Update columns of a job. Called with the lock held."""
+        fields['updated'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._conn.execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def run_queue(engine, queue, on_job=None):
+    """Download queued jobs one after the other on one engine until the queue is empty.
+
+    on_job(job, outcome) is called with outcome None when a job starts, then
+    with its final status. Stops early when the engine is cancelled; the
+    running job is then marked 'cancelled'. Returns the number of failed jobs.
+    """
+    failed = 0
+    while not engine.cancelled.is_set():
+        job = queue.claim_next()
+        if job is None:
+            break
+        if on_job is not None:
+            on_job(job, None)
+        error = None
+        try:
+            engine.download(job.url, output_dir=job.output_dir, quality=job.quality)
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            status = 'failed'
+            failed += 1
+        else:
+            status = 'cancelled' if engine.cancelled.is_set() else 'done'
+        queue.finish(job.job_id, status, error)
+        if on_job is not None:
+            on_job(job, status)
+    return failed
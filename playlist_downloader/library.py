@@ -0,0 +1,411 @@
+"""
+Library index: every downloaded video, across playlists and output directories.
+A video that is already in the library in the requested quality is materialized
+where a playlist wants it (hardlink, reflink or symlink) instead of being
+downloaded again. Content
+hashes are computed in a background pool, once per file version: a file whose
+size and mtime are unchanged is not read again. Hashing left unfinished when
+the index is closed is resumed the next time it is opened.
+
+The index is also the manifest of what is on disk: whether a video is there
+is decided from it, without looking at the files. reconcile() rebuilds it from
+the download archives of the output directories.
+"""
+
+import collections
+import contextlib
+import errno
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .archive import ARCHIVE_FILENAME
+from .paths import user_data_dir
+
+LINK_MODES = ('auto', 'hardlink', 'reflink', 'symlink')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files stat'ed at once by reconcile(); network shares answer slowly but in parallel
+RECONCILE_WORKERS = 16
+
+# Linux ioctl that clones a file's extents (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+LibraryItem = collections.namedtuple('LibraryItem', 'archive_id quality path format_id size mtime sha256')
+
+ITEM_COLUMNS = 'archive_id, quality, path, format_id, size, mtime, sha256'
+
+LIBRARY_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS library ('
+    ' archive_id TEXT NOT NULL,'
+    " quality TEXT NOT NULL DEFAULT '',"
+    ' path TEXT NOT NULL,'
+    ' format_id TEXT,'
+    ' size INTEGER,'
+    ' mtime REAL,'
+    ' sha256 TEXT,'
+    ' added REAL,'
+    ' PRIMARY KEY (archive_id, quality))'
+)
+
+
+def default_library_path():
+    """Per-user location of the library index."""
+    return user_data_dir() / "library.sqlite3"
+
+
+def file_sha256(path, abort=None):
+    """SHA-256 of a file, read in chunks; None if abort is set meanwhile."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            if abort is not None and abort.is_set():
+                return None
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def reflink(source, target):
+    """Copy-on-write clone of source at target; raises OSError where unsupported."""
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except OSError:
+                dst.close()
+                os.remove(target)
+                raise
+    elif sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), target)
+    else:
+        raise OSError(errno.ENOTSUP, "reflinks are not supported on this platform", target)
+
+
+LINKERS = {
+    'hardlink': os.link,
+    'reflink': reflink,
+    'symlink': lambda source, target: os.symlink(os.path.abspath(source), target),
+}
+
+
+def materialize(source, target, mode='auto'):
+    """Make source appear at target without copying it; returns the method used.
+
+    'auto' tries a hardlink, then a reflink, then a symlink. target is
+    replaced atomically. Raises OSError if no method works.
+    """
+    methods = ('hardlink', 'reflink', 'symlink') if mode == 'auto' else (mode,)
+    Path(target).parent.mkdir(parents=True, exist_ok=True)
+    temporary = f'{target}.link-{os.getpid()}-{threading.get_ident()}'
+    error = None
+    for method in methods:
+        try:
+            LINKERS[method](source, temporary)
+            os.replace(temporary, target)
+            return method
+        except OSError as e:
+            error = e
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+    raise error
+
+
+class LibraryIndex:
+    """SQLite index of downloaded files by archive id and quality, with their
+    content hashes. A quality of '' (files found by reconcile() in archives
+    that predate it) never matches a lookup.
+
+    Also records every place a video was materialized, so a link the user
+    deleted is not made again. Both tables are held in memory as well:
+    lookup() and has_copy() answer without a query or a file system access.
+    Every change is written in a single transaction. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, path, link_mode='auto', hash_workers=2):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"unknown link mode: {link_mode}")
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.link_mode = link_mode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(library)')}
+        if columns and 'quality' not in columns:
+            # Keyed by archive id alone before: rows keep an unknown quality
+            if 'format_id' not in columns:
+                self._conn.execute('ALTER TABLE library ADD COLUMN format_id TEXT')
+            self._conn.execute('ALTER TABLE library RENAME TO library_old')
+            self._conn.execute('DROP INDEX IF EXISTS library_sha256')
+            self._conn.execute(LIBRARY_SCHEMA)
+            self._conn.execute(
+                'INSERT INTO library (archive_id, path, format_id, size, mtime, sha256, added) '
+                'SELECT archive_id, path, format_id, size, mtime, sha256, added FROM library_old')
+            self._conn.execute('DROP TABLE library_old')
+        self._conn.execute(LIBRARY_SCHEMA)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS library_sha256 ON library (sha256)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS library_copies ('
+            ' path TEXT PRIMARY KEY,'
+            ' archive_id TEXT NOT NULL,'
+            ' method TEXT,'
+            ' added REAL)'
+        )
+        self._conn.commit()
+        self._items = {}
+        self._copies = {}
+        self._load()
+        self._hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="library-hash")
+        self._closing = threading.Event()
+        self.deduplicated = 0
+
+    def _load(self):
+        """Read both tables into memory."""
+        with self._lock:
+            self._items = {row[:2]: LibraryItem(*row) for row in self._conn.execute(
+                f'SELECT {ITEM_COLUMNS} FROM library')}
+            self._copies = {path: (archive_id, method) for path, archive_id, method in self._conn.execute(
+                'SELECT path, archive_id, method FROM library_copies')}
+
+    def __len__(self):
+        return len(self._items)
+
+    def lookup(self, archive_id, quality):
+        """The library file of a video in a quality, or None. The file is not checked:
+        linking from a file that is gone fails, and verify() catches changed ones."""
+        if not quality:
+            return None
+        return self._items.get((archive_id, quality))
+
+    def has_copy(self, path):
+        """Whether path was materialized or downloaded for the library before."""
+        return os.path.abspath(path) in self._copies
+
+    def add(self, archive_id, path, format_id=None, quality=''):
+        """Record a finished download; its hash is computed in the background."""
+        if archive_id is None or not path:
+            return
+        path = os.path.abspath(path)
+        stat = stat_or_none(path)
+        if stat is None:
+            return
+        item = LibraryItem(archive_id, quality or '', path, format_id, stat.st_size, stat.st_mtime, None)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO library ({ITEM_COLUMNS}, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (*item, time.time()))
+            self._conn.execute('INSERT OR REPLACE INTO library_copies VALUES (?, ?, ?, ?)',
+                               (path, archive_id, 'download', time.time()))
+            self._items[item[:2]] = item
+            self._copies[path] = (archive_id, 'download')
+        self._hash_pool.submit(self._hash, item[:2], path)
+
+    def link(self, item, target):
+        """Materialize a library file at target; returns the method used. Raises OSError."""
+        method = materialize(item.path, target, self.link_mode)
+        target = os.path.abspath(target)
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO library_copies VALUES (?, ?, ?, ?)',
+                               (target, item.archive_id, method, time.time()))
+            self._copies[target] = (item.archive_id, method)
+        return method
+
+    def move(self, path, new_path):
+        """A library file or a copy of one was renamed from path to new_path."""
+        path, new_path = os.path.abspath(path), os.path.abspath(new_path)
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE library SET path = ? WHERE path = ?', (new_path, path))
+            for key, item in self._items.items():
+                if item.path == path:
+                    self._items[key] = item._replace(path=new_path)
+            copy = self._copies.pop(path, None)
+            if copy is not None:
+                self._conn.execute('DELETE FROM library_copies WHERE path = ?', (path,))
+                self._conn.execute('INSERT OR REPLACE INTO library_copies VALUES (?, ?, ?, ?)',
+                                   (new_path, *copy, time.time()))
+                self._copies[new_path] = copy
+
+    def forget(self, archive_id):
+        """Drop the files of a video in every quality, e.g. once it was replaced
+        at its source; they are not linked again."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM library WHERE archive_id = ?', (archive_id,))
+            for key in [key for key in self._items if key[0] == archive_id]:
+                del self._items[key]
+
+    def resume_hashing(self):
+        """Queue hashing of the files that were never hashed. Does not look at
+        the other files."""
+        for item in list(self._items.values()):
+            if item.sha256 is None:
+                self._hash_pool.submit(self._hash, item[:2], item.path)
+
+    def verify(self):
+        """Queue hashing of every file that is new or changed since it was hashed.
+
+        Runs on the hash pool; stats every file of the library, so it is slow
+        on network shares and only run on demand (reconcile() does the same).
+        """
+        self._hash_pool.submit(self._verify)
+
+    def _verify(self):
+        for item in list(self._items.values()):
+            if self._closing.is_set():
+                return
+            stat = stat_or_none(item.path)
+            if stat is None:
+                continue
+            if item.sha256 is None or (stat.st_size, stat.st_mtime) != (item.size, item.mtime):
+                try:
+                    self._hash_pool.submit(self._hash, item[:2], item.path)
+                except RuntimeError:
+                    # Closed meanwhile
+                    return
+
+    def _hash(self, key, path):
+        """Hash pool job: store the file's hash, then deduplicate identical content."""
+        try:
+            before = os.stat(path)
+            sha256 = file_sha256(path, abort=self._closing)
+            after = os.stat(path)
+        except OSError:
+            return
+        if sha256 is None or (before.st_size, before.st_mtime) != (after.st_size, after.st_mtime):
+            # Closing, or still being written; hashed again on a later run
+            return
+        with self._lock:
+            item = self._items.get(key)
+            if self._closing.is_set() or item is None or item.path != path:
+                return
+            self._items[key] = item._replace(size=after.st_size, mtime=after.st_mtime, sha256=sha256)
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE library SET size = ?, mtime = ?, sha256 = ? WHERE archive_id = ? AND quality = ?',
+                    (after.st_size, after.st_mtime, sha256, *key))
+            twins = [twin.path for twin in self._items.values()
+                     if twin.sha256 == sha256 and twin.size == after.st_size and twin.path != path]
+        if self.link_mode in ('auto', 'hardlink'):
+            self._deduplicate(key, path, after, twins)
+
+    def _deduplicate(self, key, path, stat, twins):
+        """Replace path by a hardlink to a file with the same content (e.g. a re-upload)."""
+        for twin in twins:
+            twin_stat = stat_or_none(twin)
+            if twin_stat is None or twin_stat.st_dev != stat.st_dev or twin_stat.st_ino == stat.st_ino:
+                continue
+            try:
+                materialize(twin, path, 'hardlink')
+            except OSError:
+                continue
+            with self._lock:
+                if self._closing.is_set():
+                    return
+            with self._lock, self._conn:
+                item = self._items[key]
+                self._items[key] = item._replace(mtime=twin_stat.st_mtime)
+                self._conn.execute('UPDATE library SET mtime = ? WHERE archive_id = ? AND quality = ?',
+                                   (twin_stat.st_mtime, *key))
+                self.deduplicated += 1
+            return
+
+    def reconcile(self, output_dirs=(), workers=RECONCILE_WORKERS):
+        """Rebuild the index from disk; returns {'videos', 'files', 'missing'}.
+
+        Candidates are the files already indexed and the finished downloads in
+        the archives of output_dirs. They are stat'ed in parallel; files that
+        are gone are dropped, and hashes of unchanged files are kept. The new
+        index replaces the old one in one transaction.
+        """
+        # path -> [archive id, quality, format id, method]
+        candidates = {}
+        for path, (key, method) in self._copies.items():
+            candidates[path] = [key, '', None, method]
+        for item in self._items.values():
+            candidates[item.path] = [item.archive_id, item.quality, item.format_id,
+                                     self._copies.get(item.path, (None, 'download'))[1]]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for rows in pool.map(read_archive, output_dirs):
+                for key, filepath, format_id, quality in rows:
+                    candidate = candidates.setdefault(os.path.abspath(filepath), [key, '', None, 'download'])
+                    candidate[1] = candidate[1] or quality or ''
+                    candidate[2] = candidate[2] or format_id
+            paths = list(candidates)
+            stats = dict(zip(paths, pool.map(stat_or_none, paths)))
+
+        items, copies = {}, {}
+        for path, (key, quality, format_id, method) in candidates.items():
+            stat = stats[path]
+            if stat is None:
+                continue
+            copies[path] = (key, method)
+            old = self._items.get((key, quality))
+            if (key, quality) in items and (old is None or old.path != path):
+                continue
+            sha256 = old.sha256 if old is not None and old.path == path and \
+                (old.size, old.mtime) == (stat.st_size, stat.st_mtime) else None
+            items[key, quality] = LibraryItem(key, quality, path, format_id, stat.st_size, stat.st_mtime, sha256)
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM library')
+            self._conn.execute('DELETE FROM library_copies')
+            self._conn.executemany(
+                f'INSERT INTO library ({ITEM_COLUMNS}, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(*item, now) for item in items.values()])
+            self._conn.executemany('INSERT INTO library_copies VALUES (?, ?, ?, ?)',
+                                   [(path, key, method, now) for path, (key, method) in copies.items()])
+            self._items = items
+            self._copies = copies
+        for item in items.values():
+            if item.sha256 is None:
+                self._hash_pool.submit(self._hash, item[:2], item.path)
+        return {'videos': len(items), 'files': len(copies),
+                'missing': sum(1 for stat in stats.values() if stat is None)}
+
+    def close(self, wait=False):
+        """Close the index. Queued hashing is dropped and a file being hashed is
+        abandoned, unless wait is set; either way it is resumed on the next run."""
+        if not wait:
+            self._closing.set()
+        self._hash_pool.shutdown(wait=True, cancel_futures=not wait)
+        with self._lock:
+            self._closing.set()
+            self._conn.close()
+
+
+def read_archive(output_dir):
+    """(archive_id, filepath, format_id, quality) of the finished downloads in an
+    output directory's archive; quality is None in archives that predate it."""
+    path = os.path.join(output_dir, ARCHIVE_FILENAME)
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(downloads)')}
+        quality = 'quality' if 'quality' in columns else 'NULL'
+        return conn.execute(
+            f"SELECT archive_id, filepath, format_id, {quality} FROM downloads "
+            "WHERE status = 'done' AND filepath IS NOT NULL").fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
@@ -0,0 +1,282 @@
+"""
+Timings and counters of the download engine.
+Per-video and per-phase timings (queue wait, extraction and format
+selection, transfer, ffmpeg post-processing, UI refresh) and event counters,
+exported as JSON or in the Prometheus text format, optionally served on
+localhost. An optional cProfile of the worker threads can be switched on and
+off while downloads run.
+"""
+
+import collections
+import contextlib
+import cProfile
+import http.server
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+
+PROMETHEUS_PREFIX = 'playlist_downloader'
+
+# Finished videos whose own timings are kept; older ones only add to the phase totals
+RECENT_VIDEOS = 100
+
+# From Python 3.12, one cProfile.Profile sees every thread (sys.monitoring)
+GLOBAL_PROFILER = sys.version_info >= (3, 12)
+
+
+class Metrics:
+    """Thread-safe phase timings and counters.
+
+    A phase is timed either with timed() around a block, or with begin() and
+    end() when it starts and ends in different places (e.g. a transfer runs
+    from the first to the last progress hook call of a file). begin/end pairs
+    are keyed by video id, and their time also adds up per video, for the
+    videos in progress and the last RECENT_VIDEOS finished ones.
+    """
+
+    def __init__(self, gauges=None):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = collections.Counter()
+        self.phases = {}
+        self.videos = {}
+        self.recent_videos = collections.deque(maxlen=RECENT_VIDEOS)
+        self.open_phases = {}
+        self.gauges = gauges
+
+    def count(self, name, kind=None, amount=1):
+        """Add to the counter name (optionally split by kind)."""
+        with self.lock:
+            self.counters[name, kind] += amount
+
+    def observe(self, phase, seconds, video_id=None):
+        """Record one timing of a phase."""
+        with self.lock:
+            self._observe(phase, seconds, video_id)
+
+    def _observe(self, phase, seconds, video_id):
+        """Record a timing. Called with the lock held."""
+        totals = self.phases.get(phase)
+        if totals is None:
+            totals = self.phases[phase] = [0, 0.0, 0.0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        if video_id is not None:
+            video = self.videos.setdefault(video_id, {})
+            video[phase] = video.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def timed(self, phase, video_id=None):
+        """Time the enclosed block as one occurrence of phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start, video_id)
+
+    def timed_iter(self, phase, iterable):
+        """Yield from iterable, timing each wait for the next item as one occurrence of phase."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.observe(phase, time.perf_counter() - start)
+            yield item
+
+    def begin(self, video_id, phase):
+        """Start timing phase for a video; ignored while it is already running."""
+        with self.lock:
+            self.open_phases.setdefault((video_id, phase), time.perf_counter())
+
+    def end(self, video_id, phase):
+        """Stop timing phase for a video; returns False if it was not running."""
+        with self.lock:
+            start = self.open_phases.pop((video_id, phase), None)
+            if start is None:
+                return False
+            self._observe(phase, time.perf_counter() - start, video_id)
+            return True
+
+    def forget(self, video_id):
+        """A video finished or stopped early: drop its open phases, and keep its
+        timings among the recent ones."""
+        with self.lock:
+            for key in [key for key in self.open_phases if key[0] == video_id]:
+                del self.open_phases[key]
+            timings = self.videos.pop(video_id, None)
+            if timings is not None:
+                self.recent_videos.append((video_id, timings))
+
+    def snapshot(self):
+        """Counters, phase totals and per-video timings, as a dict."""
+        with self.lock:
+            counters = {}
+            for (name, kind), value in self.counters.items():
+                if kind is None:
+                    counters[name] = value
+                else:
+                    counters.setdefault(name, {})[kind] = value
+            phases = {
+                phase: {'count': count, 'total_s': total, 'mean_s': total / count, 'max_s': longest}
+                for phase, (count, total, longest) in self.phases.items()
+            }
+            videos = {video_id: dict(timings)
+                      for video_id, timings in [*self.recent_videos, *self.videos.items()]}
+        return {
+            'uptime_s': time.time() - self.started,
+            'counters': counters,
+            'phases': phases,
+            'videos': videos,
+            'gauges': self.gauges() if self.gauges is not None else {},
+        }
+
+    def to_json(self, path=None):
+        """The snapshot as JSON; also written to path when given."""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def prometheus(self):
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        prefix = PROMETHEUS_PREFIX
+        lines = [
+            f'# HELP {prefix}_phase_seconds Time spent in each phase.',
+            f'# TYPE {prefix}_phase_seconds summary',
+        ]
+        for phase, totals in sorted(snapshot['phases'].items()):
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {totals["total_s"]:.6f}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {totals["count"]}')
+        lines.append(f'# TYPE {prefix}_phase_seconds_max gauge')
+        for phase, totals in sorted(snapshot['phases'].items()):
+            lines.append(f'{prefix}_phase_seconds_max{{phase="{phase}"}} {totals["max_s"]:.6f}')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            if isinstance(value, dict):
+                lines.extend(f'{prefix}_{name}_total{{kind="{kind}"}} {count}'
+                             for kind, count in sorted(value.items()))
+            else:
+                lines.append(f'{prefix}_{name}_total {value}')
+        for name, value in sorted(snapshot['gauges'].items()):
+            if value is not None:
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {value}')
+        lines.append(f'{prefix}_uptime_seconds {snapshot["uptime_s"]:.3f}')
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """cProfile of the engine's threads, switched on and off at runtime.
+
+    Before Python 3.12 a profile only sees its own thread, so every profiled()
+    block (a video download, a post-processing job) gets its own profile and
+    stop() merges them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.profiles = []
+        self.global_profile = None
+
+    def start(self):
+        with self.lock:
+            if self.enabled:
+                return
+            self.enabled = True
+            self.profiles = []
+            if GLOBAL_PROFILER:
+                self.global_profile = cProfile.Profile()
+                self.global_profile.enable()
+
+    def stop(self, path=None):
+        """Stop profiling; returns the merged pstats.Stats (or None) and dumps it to path."""
+        with self.lock:
+            if not self.enabled:
+                return None
+            self.enabled = False
+            if self.global_profile is not None:
+                self.global_profile.disable()
+                self.profiles.append(self.global_profile)
+                self.global_profile = None
+            profiles, self.profiles = self.profiles, []
+        if not profiles:
+            return None
+        stats = pstats.Stats(*profiles)
+        if path is not None:
+            stats.dump_stats(path)
+        return stats
+
+    @contextlib.contextmanager
+    def profiled(self):
+        """Profile the enclosed block on this thread while profiling is on."""
+        if not self.enabled or GLOBAL_PROFILER:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self.lock:
+                self.profiles.append(profile)
+
+
+def format_stats(stats, limit=40):
+    """Top functions of a pstats.Stats by cumulative time, as text."""
+    if stats is None:
+        return "no profile recorded\n"
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """GET /metrics (Prometheus), /metrics.json, /profile/start and /profile/stop."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        metrics, profiler = self.server.metrics, self.server.profiler
+        if self.path == '/metrics':
+            self.reply(metrics.prometheus(), 'text/plain')
+        elif self.path == '/metrics.json':
+            self.reply(metrics.to_json(), 'application/json')
+        elif self.path == '/profile/start':
+            profiler.start()
+            self.reply("profiling\n", 'text/plain')
+        elif self.path == '/profile/stop':
+            self.reply(format_stats(profiler.stop()), 'text/plain')
+        else:
+            self.send_error(404)
+
+    def reply(self, text, content_type):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_metrics(metrics, profiler, port=0):
+    """Serve metrics on 127.0.0.1:port from a daemon thread; returns the server."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    server.profiler = profiler
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,22 @@
+"""
+Per-user directories of the application: databases in the data directory
+(%LOCALAPPDATA% on Windows, $XDG_DATA_HOME or ~/.local/share elsewhere),
+disposable files in the cache directory ($XDG_CACHE_HOME or ~/.cache).
+"""
+
+import os
+from pathlib import Path
+
+APP_DIRECTORY = "youtube_downloader"
+
+
+def user_data_dir():
+    """Per-user directory of the job queue and the library index."""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_DATA_HOME') or Path.home() / ".local" / "share"
+    return Path(base) / APP_DIRECTORY
+
+
+def user_cache_dir():
+    """Per-user directory of caches that can be deleted at any time."""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache"
+    return Path(base) / APP_DIRECTORY
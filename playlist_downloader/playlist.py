@@ -0,0 +1,66 @@
+"""
+Helpers for walking playlist entries returned by yt-dlp.
+"""
+
+import yt_dlp
+
+
+def iter_playlist_entries(entries):
+    """Yield playlist entries as the extractor produces them."""
+    if isinstance(entries, yt_dlp.utils.PagedList):
+        # Paged playlists are fetched one page at a time instead of all at once
+        step = getattr(entries, '_pagesize', None) or 1
+        start = 0
+        while True:
+            page = entries.getslice(start, start + step)
+            if not page:
+                return
+            yield from page
+            start += len(page)
+    else:
+        yield from entries
+
+
+def entry_thumbnail(entry, min_width=320):
+    """URL of the smallest thumbnail at least min_width wide (or the largest one)."""
+    thumbnails = [t for t in entry.get('thumbnails') or [] if t.get('url')]
+    sized = sorted((t for t in thumbnails if t.get('width')), key=lambda t: t['width'])
+    for thumbnail in sized:
+        if thumbnail['width'] >= min_width:
+            return thumbnail['url']
+    if entry.get('thumbnail'):
+        return entry['thumbnail']
+    return (sized or thumbnails or [{}])[-1].get('url')
+
+
+def playlist_extra_info(info, index):
+    """Playlist fields yt-dlp would add to an entry (used by the outtmpl)."""
+    playlist_count = info.get('playlist_count')
+    return {
+        'playlist': info.get('title') or info.get('id'),
+        'playlist_id': info.get('id'),
+        'playlist_title': info.get('title'),
+        'playlist_uploader': info.get('uploader'),
+        'playlist_uploader_id': info.get('uploader_id'),
+        'playlist_webpage_url': info.get('webpage_url'),
+        'playlist_count': playlist_count,
+        'playlist_index': index,
+        'playlist_autonumber': index,
+        # Zero-pads playlist_index in file names when the size is known
+        '__last_playlist_index': playlist_count or 0,
+    }
+
+
+def flat_entry(entry):
+    """A url entry that stands for an extracted video, without its formats and
+    other bulky fields; processing it extracts the video again."""
+    if entry.get('_type') in ('url', 'url_transparent'):
+        return entry
+    return {
+        '_type': 'url',
+        'id': entry.get('id'),
+        'ie_key': entry.get('extractor_key') or entry.get('ie_key'),
+        'url': entry.get('webpage_url') or entry.get('original_url') or entry.get('url'),
+        'title': entry.get('title'),
+        'duration': entry.get('duration'),
+    }
@@ -0,0 +1,94 @@
+"""
+Retrying failed downloads.
+Errors are classified as transient (network trouble, throttling, server
+errors: worth another try later) or permanent (private, removed,
+region-locked or age-restricted videos, missing formats). Transient failures
+are retried with exponential backoff and random jitter, so videos that failed
+together do not all come back at the same moment.
+"""
+
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+
+from .concurrency import THROTTLE_PATTERN
+
+# Downloads attempted per video, the first one included
+RETRY_ATTEMPTS = 4
+
+# Backoff before retry n: about RETRY_BASE_DELAY * 2**(n - 1) seconds, capped
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 120.0
+
+# yt-dlp messages of errors that another try will not fix
+PERMANENT_PATTERN = re.compile(
+    r'Private video|Video unavailable|This video (is|has been) (not available|removed|unavailable)'
+    r'|has been removed|account .* (terminated|closed)|copyright|members[- ]only|Join this channel'
+    r'|confirm your age|age[- ]restricted|inappropriate for some users|not available in your country'
+    r'|geo[- ]?restrict|blocked it in your country|Premieres in|live event will begin'
+    r'|Requested format is not available|Unsupported URL|DRM protected|HTTP Error 40[14]|HTTP Error 410'
+    r'|No space left on device|Permission denied',
+    re.IGNORECASE)
+
+
+def error_message(message):
+    """yt-dlp's error text without its 'ERROR:' or retry prefix."""
+    return re.sub(r'^(?:(?:ERROR:|\[download\] Got error:)\s*)+', '', message.strip())
+
+
+def classify_error(message):
+    """'transient' or 'permanent'. Unknown errors count as transient, so they get a few tries."""
+    if THROTTLE_PATTERN.search(message):
+        return 'transient'
+    if PERMANENT_PATTERN.search(message):
+        return 'permanent'
+    return 'transient'
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry number attempt (1 for the first retry).
+
+    Half of the exponential delay is fixed and half is random ("equal
+    jitter"), which keeps a minimum pause while spreading retries apart.
+    """
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryQueue:
+    """Failed downloads waiting for their backoff to pass, earliest first."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def add(self, entry, extra_info, delay):
+        with self.lock:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.sequence), entry, extra_info))
+
+    def next_delay(self):
+        """Seconds until the next retry is due (0 if overdue), or None if none is waiting."""
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, self.heap[0][0] - time.monotonic())
+
+    def pop(self):
+        """Remove and return the earliest (entry, extra_info)."""
+        with self.lock:
+            _, _, entry, extra_info = heapq.heappop(self.heap)
+            return entry, extra_info
+
+    def drain(self):
+        """Remove and return every waiting (entry, extra_info)."""
+        with self.lock:
+            waiting, self.heap = self.heap, []
+        return [(entry, extra_info) for _, _, entry, extra_info in sorted(waiting)]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
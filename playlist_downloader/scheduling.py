@@ -0,0 +1,94 @@
+"""
+Order in which listed playlist entries are downloaded.
+Entries are estimated by size (filesize, filesize_approx, or duration times
+a typical bitrate of the chosen quality) and picked in playlist order,
+smallest first, or alternating small and large ones. Output names still come
+from each entry's playlist_index.
+"""
+
+import collections
+import heapq
+import itertools
+import threading
+
+SCHEDULING_MODES = ('playlist', 'smallest', 'balanced')
+
+# Typical bytes per second of a video in each quality, for entries that only
+# have a duration (flat playlist listings)
+ESTIMATED_BITRATES = {
+    'highest': 1_000_000,
+    '1080p': 500_000,
+    '720p': 250_000,
+    'audio': 16_000,
+}
+
+
+def estimated_size(entry, quality='highest'):
+    """Estimated download size of an entry in bytes, or None if nothing is known."""
+    formats = entry.get('requested_formats') or [entry]
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+    if all(sizes):
+        return sum(sizes)
+    if entry.get('duration'):
+        return entry['duration'] * ESTIMATED_BITRATES.get(quality, ESTIMATED_BITRATES['highest'])
+    return None
+
+
+class DownloadScheduler:
+    """Pending downloads, handed to the workers in the order of the mode.
+
+    - playlist: in the order they were listed
+    - smallest: smallest estimated size first; entries of unknown size
+      count as the largest
+    - balanced: alternately the smallest and the largest entry, so large
+      videos start early on some workers while the others keep finishing
+      short ones
+
+    Workers call pop() right before they start a download, so entries listed
+    later still compete with the ones already waiting.
+    """
+
+    def __init__(self, mode='playlist', quality='highest'):
+        if mode not in SCHEDULING_MODES:
+            raise ValueError(f"unknown scheduling mode: {mode}")
+        self.mode = mode
+        self.quality = quality
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.fifo = collections.deque()
+        self.smallest = []
+        self.largest = []
+        self.taken = set()
+        self.pick_largest = False
+
+    def add(self, entry, extra_info=None):
+        """Queue an entry for download."""
+        with self.lock:
+            if self.mode == 'playlist':
+                self.fifo.append((entry, extra_info))
+                return
+            size = estimated_size(entry, self.quality)
+            order = next(self.sequence)
+            # Unknown sizes sort after every known one; ties keep playlist order
+            key = (size is None, size or 0)
+            heapq.heappush(self.smallest, (*key, order, entry, extra_info))
+            if self.mode == 'balanced':
+                heapq.heappush(self.largest, (not key[0], -key[1], order, entry, extra_info))
+
+    def pop(self):
+        """Remove and return the next (entry, extra_info), or None if nothing is pending."""
+        with self.lock:
+            if self.mode == 'playlist':
+                return self.fifo.popleft() if self.fifo else None
+            heap = self.largest if self.mode == 'balanced' and self.pick_largest else self.smallest
+            self.pick_largest = not self.pick_largest
+            # Entries taken from the other heap are dropped when they surface here
+            while heap:
+                *_, order, entry, extra_info = heapq.heappop(heap)
+                if order in self.taken:
+                    self.taken.discard(order)
+                    continue
+                if self.mode == 'balanced':
+                    self.taken.add(order)
+                return entry, extra_info
+            return None
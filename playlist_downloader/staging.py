@@ -0,0 +1,140 @@
+"""
+Staging directory for downloads bound for slow output storage.
+Fragments, .part files and ffmpeg merges are written to a fast local
+directory; finished files are then published to the output directory by a
+rename, or by a streamed copy when the two are on different file systems,
+in a small background pool.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import Metrics
+
+# Bytes of finished downloads the staging directory holds before new
+# downloads wait for publishing to catch up
+STAGING_LIMIT = 4 * 1024 ** 3
+
+# Buffer of a copy to another file system
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+PUBLISH_SUFFIX = '.publishing'
+
+
+def staging_root(staging_dir, output_dir):
+    """Staging directory of one output directory.
+
+    Named after the output path, so downloads into different output
+    directories never share files, and a later run finds its .part files.
+    """
+    name = hashlib.sha1(os.path.abspath(output_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(staging_dir, name)
+
+
+def publish_file(source, target):
+    """Move source to target; returns 'rename' or 'copy'.
+
+    Across file systems the file is copied to a temporary name next to
+    target and renamed into place, so target never shows a partial file.
+    """
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    try:
+        os.replace(source, target)
+        return 'rename'
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temp = target + PUBLISH_SUFFIX
+    try:
+        with open(source, 'rb') as src, open(temp, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    os.remove(source)
+    return 'copy'
+
+
+class PublishStage:
+    """Pool that publishes finished files while the next videos download.
+
+    Every file finished in the staging directory counts against
+    max_staged_bytes until its video is published or given up (release());
+    wait_for_space() holds back new downloads while the limit is reached.
+    """
+
+    def __init__(self, workers, max_staged_bytes=STAGING_LIMIT, on_change=None, metrics=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="publish")
+        self.max_staged_bytes = max_staged_bytes
+        self.on_change = on_change
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.condition = threading.Condition()
+        self.staged = {}
+        self.queued = 0
+        self.active = 0
+
+    @property
+    def staged_bytes(self):
+        with self.condition:
+            return sum(self.staged.values())
+
+    def add(self, video_id, size):
+        """Account a file of video_id finished in the staging directory."""
+        with self.condition:
+            self.staged[video_id] = self.staged.get(video_id, 0) + size
+
+    def release(self, video_id):
+        """The files of video_id left the staging directory."""
+        with self.condition:
+            if self.staged.pop(video_id, None) is not None:
+                self.condition.notify_all()
+
+    def wait_for_space(self, abort=None):
+        """Block while the staging directory holds max_staged_bytes or more."""
+        with self.condition:
+            while sum(self.staged.values()) >= self.max_staged_bytes:
+                if abort is not None and abort.is_set():
+                    return
+                # Woken by release(); the timeout notices abort
+                self.condition.wait(0.25)
+
+    def changed(self, queued=0, active=0):
+        with self.condition:
+            self.queued += queued
+            self.active += active
+        if self.on_change is not None:
+            self.on_change()
+
+    def submit(self, files, video_id=None):
+        """Publish (source, target) pairs in the background. Returns a Future
+        of the publishing method of each file."""
+        self.changed(queued=1)
+
+        def run():
+            self.changed(queued=-1, active=1)
+            try:
+                methods = []
+                with self.metrics.timed('publish', video_id):
+                    for source, target in files:
+                        methods.append(publish_file(source, target))
+                        self.metrics.count('published', methods[-1])
+                return methods
+            finally:
+                self.changed(active=-1)
+
+        return self.pool.submit(run)
+
+    def shutdown(self):
+        """Wait for every queued file."""
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,139 @@
+"""
+Per-video state of a download, compact enough for playlists of 10k+ videos.
+Rows are kept in parallel arrays (video id, playlist index, status, bytes)
+instead of a dict or info dict per video. The engine updates them from its
+events; the GUI, the CLI and the metrics read them.
+"""
+
+import array
+import collections
+import enum
+import threading
+
+
+class VideoStatus(enum.IntEnum):
+    LISTED = 0
+    QUEUED = 1
+    DOWNLOADING = 2
+    POSTPROCESSING = 3
+    RETRYING = 4
+    DONE = 5
+    SKIPPED = 6
+    FAILED = 7
+    CANCELLED = 8
+
+
+# Engine event -> status of its video
+EVENT_STATUSES = {
+    'video': VideoStatus.LISTED,
+    'downloading': VideoStatus.DOWNLOADING,
+    'finished': VideoStatus.POSTPROCESSING,
+    'retrying': VideoStatus.RETRYING,
+    'done': VideoStatus.DONE,
+    'skipped': VideoStatus.SKIPPED,
+    'failed': VideoStatus.FAILED,
+    'cancelled': VideoStatus.CANCELLED,
+}
+
+VideoRecord = collections.namedtuple('VideoRecord', 'video_id index status downloaded_bytes total_bytes')
+
+
+class VideoStates:
+    """Thread-safe table of videos, one row per video id in the order they appeared.
+
+    About 100 bytes per video besides its id string: the row in a dict and
+    the id list, and a few bytes in each of the arrays. The number of videos
+    in each status is kept as they change, so counts() does not scan the rows.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = []
+        self.rows = {}
+        self.indexes = array.array('l')
+        self.statuses = bytearray()
+        self.downloaded = array.array('q')
+        self.totals = array.array('q')
+        self.status_counts = [0] * len(VideoStatus)
+
+    def _row(self, video_id, index=0):
+        """Row of a video, added if it is new. Called with the lock held."""
+        row = self.rows.get(video_id)
+        if row is None:
+            row = self.rows[video_id] = len(self.ids)
+            self.ids.append(video_id)
+            self.indexes.append(index)
+            self.statuses.append(VideoStatus.LISTED)
+            self.status_counts[VideoStatus.LISTED] += 1
+            self.downloaded.append(0)
+            self.totals.append(0)
+        return row
+
+    def _set_status(self, row, status):
+        """Change the status of a row. Called with the lock held."""
+        self.status_counts[self.statuses[row]] -= 1
+        self.status_counts[status] += 1
+        self.statuses[row] = status
+
+    def add(self, video_id, index=0):
+        """Add a listed video; returns its row (a known video keeps its row)."""
+        with self.lock:
+            return self._row(video_id, index)
+
+    def set_status(self, video_id, status):
+        with self.lock:
+            self._set_status(self._row(video_id), status)
+
+    def set_bytes(self, video_id, downloaded_bytes, total_bytes):
+        with self.lock:
+            row = self._row(video_id)
+            self.downloaded[row] = downloaded_bytes
+            self.totals[row] = total_bytes
+
+    def record(self, event, data):
+        """Apply an engine event (see DownloadEngine) to its video's row."""
+        status = EVENT_STATUSES.get(event)
+        video_id = data.get('video_id')
+        if status is None or not video_id:
+            return
+        with self.lock:
+            row = self._row(video_id, data.get('index') or 0)
+            self._set_status(row, status)
+            if event == 'downloading':
+                self.downloaded[row] = data['video_downloaded_bytes']
+                self.totals[row] = data['video_total_bytes']
+            elif event == 'done':
+                self.downloaded[row] = self.totals[row] = max(self.downloaded[row], self.totals[row])
+
+    def get(self, video_id):
+        """VideoRecord of a video, or None."""
+        with self.lock:
+            row = self.rows.get(video_id)
+            if row is None:
+                return None
+            return self._record(row)
+
+    def _record(self, row):
+        return VideoRecord(self.ids[row], self.indexes[row], VideoStatus(self.statuses[row]),
+                           self.downloaded[row], self.totals[row])
+
+    def progress(self, video_id):
+        """Fraction of a video downloaded (0.0 when its size is unknown)."""
+        with self.lock:
+            row = self.rows.get(video_id)
+            if row is None or not self.totals[row]:
+                return 0.0
+            return min(1.0, self.downloaded[row] / self.totals[row])
+
+    def counts(self):
+        """Number of videos in each status, by lower-case status name."""
+        with self.lock:
+            return {status.name.lower(): self.status_counts[status] for status in VideoStatus}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        """VideoRecords in row order (a copy, taken under the lock)."""
+        with self.lock:
+            return iter([self._record(row) for row in range(len(self.ids))])
@@ -0,0 +1,41 @@
+"""
+Shared fixtures: the offline benchmark's local server and fake extractors
+stand in for the video site, so the tests need no network access.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import offline  # noqa: E402
+
+# A playlist of 6 small videos over two pages, served without delays
+PLAYLIST = dict(offline.SCENARIOS['small'], videos=6, size_kib=16, page_size=4, latency=0)
+
+
+@pytest.fixture
+def server():
+    server = offline.serve(dict(PLAYLIST))
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def playlist_url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}/playlist/bench'
+
+
+@pytest.fixture
+def events():
+    """Engine listener keeping every (event, data) pair."""
+    class Recorder(list):
+        def __call__(self, event, data):
+            self.append((event, data))
+
+        def of(self, name):
+            return [data for event, data in self if event == name]
+
+    return Recorder()
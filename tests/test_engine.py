@@ -0,0 +1,59 @@
+import os
+
+import offline
+from conftest import PLAYLIST
+from playlist_downloader import metrics as metrics_module
+from playlist_downloader.archive import ARCHIVE_FILENAME
+
+
+def test_cancel_marks_queued_videos_cancelled(tmp_path, playlist_url, events):
+    def listener(event, data):
+        events(event, data)
+        if event == 'downloading':
+            engine.cancel()
+
+    with offline.BenchmarkEngine(str(tmp_path), max_workers=1, stream=False, listener=listener) as engine:
+        engine.download(playlist_url)
+        counts = engine.videos.counts()
+
+    # The first video may finish with its last progress tick
+    assert counts['queued'] == 0
+    assert counts['cancelled'] + counts['done'] == PLAYLIST['videos']
+    assert len(events.of('cancelled')) >= PLAYLIST['videos'] - 1
+
+
+def test_archived_entries_are_listed_without_streaming(tmp_path, playlist_url, events):
+    with offline.BenchmarkEngine(str(tmp_path), stream=False, listener=events) as engine:
+        engine.download(playlist_url)
+        events.clear()
+        engine.download(playlist_url)
+        assert engine.videos.counts()['skipped'] == PLAYLIST['videos']
+
+    assert events.of('listed') == [{'count': PLAYLIST['videos'], 'new': None}]
+    assert [data['index'] for data in events.of('video')] == list(range(1, PLAYLIST['videos'] + 1))
+    assert {data['reason'] for data in events.of('skipped')} == {'archived'}
+    assert len(events.of('skipped')) == PLAYLIST['videos']
+
+
+def test_finished_videos_leave_the_live_timings(tmp_path, playlist_url, monkeypatch):
+    monkeypatch.setattr(metrics_module, 'RECENT_VIDEOS', 2)
+    with offline.BenchmarkEngine(str(tmp_path)) as engine:
+        engine.download(playlist_url)
+        assert engine.metrics.videos == {}
+        assert len(engine.metrics.snapshot()['videos']) == 2
+        assert engine.metrics.snapshot()['phases']['total']['count'] == PLAYLIST['videos']
+
+
+def test_files_already_on_disk_are_not_counted_as_downloaded(tmp_path, playlist_url, events):
+    with offline.BenchmarkEngine(str(tmp_path), listener=events) as engine:
+        engine.download(playlist_url)
+        # Without the archive, yt-dlp finds the finished files itself
+        os.remove(os.path.join(tmp_path, ARCHIVE_FILENAME))
+        events.clear()
+        engine.download(playlist_url)
+        assert engine.videos.counts()['done'] == PLAYLIST['videos']
+
+    assert len(events.of('finished')) == PLAYLIST['videos']
+    session = events.of('stats')[-1]['session']
+    assert session['downloaded_bytes'] == 0
+    assert session['speed'] is None
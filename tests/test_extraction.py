@@ -0,0 +1,51 @@
+import collections
+
+import pytest
+
+import offline
+from conftest import PLAYLIST
+
+
+class CountingVideoIE(offline.FakeVideoIE):
+    calls = collections.Counter()
+
+    @classmethod
+    def ie_key(cls):
+        # Playlist entries name the extractor that resolves them
+        return offline.FakeVideoIE.ie_key()
+
+    def _real_extract(self, url):
+        info = super()._real_extract(url)
+        self.calls[info['id']] += 1
+        return info
+
+
+class CountingPlaylistIE(offline.FakePlaylistIE):
+    calls = collections.Counter()
+
+    def _real_extract(self, url):
+        self.calls['playlist'] += 1
+        return super()._real_extract(url)
+
+
+class CountingEngine(offline.BenchmarkEngine):
+    extractors = (CountingVideoIE, CountingPlaylistIE)
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    CountingVideoIE.calls.clear()
+    CountingPlaylistIE.calls.clear()
+
+
+@pytest.mark.parametrize('stream', [True, False], ids=['stream', 'no-stream'])
+def test_each_entry_is_extracted_once(tmp_path, playlist_url, events, stream):
+    with CountingEngine(str(tmp_path), stream=stream, listener=events) as engine:
+        engine.download(playlist_url)
+        assert engine.videos.counts()['done'] == PLAYLIST['videos']
+
+    assert CountingPlaylistIE.calls['playlist'] == 1
+    assert len(CountingVideoIE.calls) == PLAYLIST['videos']
+    assert set(CountingVideoIE.calls.values()) == {1}
+    # The cards are filled from the same pass
+    assert len(events.of('video')) == PLAYLIST['videos']
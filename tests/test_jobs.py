@@ -0,0 +1,31 @@
+import os
+import sqlite3
+
+import offline
+from conftest import PLAYLIST
+from playlist_downloader.archive import ARCHIVE_FILENAME
+from playlist_downloader.jobs import JobQueue, run_queue
+
+
+def archive_statuses(output_dir):
+    with sqlite3.connect(os.path.join(output_dir, ARCHIVE_FILENAME)) as conn:
+        return [status for status, in conn.execute('SELECT status FROM downloads')]
+
+
+def test_jobs_into_two_directories_are_archived(tmp_path, playlist_url):
+    first, second = str(tmp_path / 'first'), str(tmp_path / 'second')
+    queue = JobQueue(':memory:')
+    queue.add(playlist_url, first, 'highest')
+    queue.add(playlist_url, second, 'highest')
+    # One engine for both jobs: its YoutubeDL instances are reconfigured
+    with offline.BenchmarkEngine(first) as engine:
+        assert run_queue(engine, queue) == 0
+        assert engine.videos.counts()['done'] == PLAYLIST['videos']
+
+        for output_dir in (first, second):
+            assert archive_statuses(output_dir) == ['done'] * PLAYLIST['videos']
+
+        # A rerun finds everything in the second directory's archive
+        engine.download(playlist_url, output_dir=second)
+        assert engine.videos.counts()['skipped'] == PLAYLIST['videos']
+    queue.close()
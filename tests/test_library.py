@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import threading
+
+import offline
+from conftest import PLAYLIST
+from playlist_downloader import library as library_module
+from playlist_downloader.library import LibraryIndex
+
+
+def test_library_links_only_the_requested_quality(tmp_path, playlist_url, events):
+    library = str(tmp_path / 'library.sqlite3')
+    with offline.BenchmarkEngine(str(tmp_path / 'video'), library=library, listener=events) as engine:
+        engine.download(playlist_url)
+        assert engine.videos.counts()['done'] == PLAYLIST['videos']
+
+        # Another quality is downloaded, not linked from the video files
+        engine.download(playlist_url, output_dir=str(tmp_path / 'audio'), quality='audio')
+        assert engine.videos.counts()['done'] == PLAYLIST['videos']
+        assert not events.of('skipped')
+
+        engine.download(playlist_url, output_dir=str(tmp_path / 'again'))
+        assert engine.videos.counts()['skipped'] == PLAYLIST['videos']
+        assert {data['reason'] for data in events.of('skipped')} == {'library'}
+
+
+def test_reordered_playlist_is_not_linked_again(tmp_path, server, playlist_url, events):
+    output_dir = tmp_path / 'video'
+    library = str(tmp_path / 'library.sqlite3')
+    with offline.BenchmarkEngine(str(output_dir), library=library, listener=events) as engine:
+        engine.download(playlist_url)
+        files = sorted(path for path in output_dir.rglob('*') if path.is_file())
+
+        # A new video at the top shifts the playlist_index of every other one
+        server.config['added'] = 1
+        events.clear()
+        engine.download(playlist_url)
+        assert engine.videos.counts()['skipped'] == PLAYLIST['videos']
+        assert {data['reason'] for data in events.of('skipped')} == {'archived'}
+
+    new_files = sorted(path for path in output_dir.rglob('*') if path.is_file() and path not in files)
+    # Only the added video is downloaded; the others are not linked under their new names
+    assert [path.name for path in new_files] == ['1 - Video new00000.mp4']
+
+
+def test_library_without_quality_is_migrated(tmp_path):
+    path = str(tmp_path / 'library.sqlite3')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE library (archive_id TEXT PRIMARY KEY, path TEXT NOT NULL, '
+                     'size INTEGER, mtime REAL, sha256 TEXT, added REAL)')
+        conn.execute("INSERT INTO library VALUES ('bench v1', ?, 1, 0, NULL, 0)", (str(tmp_path / 'v1.mp4'),))
+    conn.close()
+
+    library = LibraryIndex(path)
+    try:
+        assert len(library) == 1
+        # The quality of the old file is unknown, so it is not linked
+        assert library.lookup('bench v1', 'highest') is None
+        (tmp_path / 'v1.mp4').write_bytes(b'video')
+        library.add('bench v1', str(tmp_path / 'v1.mp4'), 'mp4', 'highest')
+        assert library.lookup('bench v1', 'highest').path == os.path.abspath(tmp_path / 'v1.mp4')
+    finally:
+        library.close()
+
+
+def test_close_does_not_wait_for_hashing(tmp_path, monkeypatch):
+    path = str(tmp_path / 'library.sqlite3')
+    files = []
+    for n in range(4):
+        files.append(tmp_path / f'v{n}.mp4')
+        files[-1].write_bytes(os.urandom(1024))
+
+    real_sha256 = library_module.file_sha256
+
+    def endless_sha256(path, abort=None):
+        # Stands in for a huge file on a slow share: done only when aborted
+        abort.wait()
+        return None
+
+    monkeypatch.setattr(library_module, 'file_sha256', endless_sha256)
+    library = LibraryIndex(path, hash_workers=1)
+    for n, file in enumerate(files):
+        library.add(f'bench v{n}', str(file), 'mp4', 'highest')
+    closing = threading.Thread(target=library.close)
+    closing.start()
+    closing.join(5)
+    assert not closing.is_alive()
+
+    # The next run hashes what was left
+    monkeypatch.setattr(library_module, 'file_sha256', real_sha256)
+    library = LibraryIndex(path)
+    library.resume_hashing()
+    library.close(wait=True)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM library WHERE sha256 IS NOT NULL').fetchone()[0] == len(files)
+    conn.close()
@@ -0,0 +1,51 @@
+import os
+
+import offline
+from conftest import PLAYLIST
+from playlist_downloader.archive import ARCHIVE_FILENAME, DownloadArchive, archive_id
+
+
+KEY = archive_id({'ie_key': offline.FakeVideoIE.ie_key(), 'id': 'v00001'})
+
+
+def video_files(output_dir):
+    return sorted(path.name for path in output_dir.rglob('*.mp4'))
+
+
+def test_renamed_video_is_renamed_not_downloaded(tmp_path, server, playlist_url, events):
+    library = str(tmp_path / 'library.sqlite3')
+    with offline.BenchmarkEngine(str(tmp_path), sync=True, library=library, listener=events) as engine:
+        engine.download(playlist_url)
+        assert '2 - Video v00001.mp4' in video_files(tmp_path)
+
+        server.config['titles'] = {'v00001': 'Better title'}
+        events.clear()
+        engine.download(playlist_url)
+        assert engine.videos.counts()['skipped'] == PLAYLIST['videos']
+        assert events.of('listed')[0]['new'] == 0
+        assert engine.library.lookup(KEY, 'highest').path.endswith('2 - Better title.mp4')
+
+    files = video_files(tmp_path)
+    assert '2 - Better title.mp4' in files
+    assert '2 - Video v00001.mp4' not in files
+    assert len(files) == PLAYLIST['videos']
+    archive = DownloadArchive(os.path.join(tmp_path, ARCHIVE_FILENAME))
+    assert archive.filepath(KEY).endswith('2 - Better title.mp4')
+    archive.close()
+
+
+def test_replaced_video_is_downloaded_again(tmp_path, server, playlist_url, events):
+    with offline.BenchmarkEngine(str(tmp_path), sync=True, listener=events) as engine:
+        engine.download(playlist_url)
+
+        server.config['durations'] = {'v00002': 90}
+        server.config['titles'] = {'v00002': 'Re-upload'}
+        events.clear()
+        engine.download(playlist_url)
+        assert engine.videos.counts()['done'] == 1
+        assert events.of('listed')[0]['new'] == 1
+
+    files = video_files(tmp_path)
+    assert '3 - Re-upload.mp4' in files
+    assert '3 - Video v00002.mp4' not in files
+    assert len(files) == PLAYLIST['videos']
@@ -0,0 +1,155 @@
+"""
+Thumbnail loading for the video list.
+Thumbnails are fetched over a few persistent HTTP connections, downscaled to
+the card size in a separate worker pool, and cached in memory (LRU) and on
+disk (keyed by video id), so reopening a playlist needs no network at all.
+"""
+
+import http.client
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from playlist_downloader.paths import user_cache_dir
+
+# Size of the thumbnail area of a video card
+THUMBNAIL_SIZE = (140, 85)
+
+THUMBNAIL_FETCH_TIMEOUT = 10
+
+
+def default_cache_dir():
+    """Per-user cache directory for downscaled thumbnails."""
+    return user_cache_dir() / "thumbnails"
+
+
+class ThumbnailCache:
+    """Fetches, downscales and caches video thumbnails as PIL images.
+
+    fetch_workers bounds the number of open HTTP connections; each fetch
+    thread keeps one keep-alive connection per host. Decoding and resizing run
+    on decode_workers threads. callback(video_id) is called from a worker
+    thread once an image is available through get().
+    """
+
+    def __init__(self, cache_dir=None, memory_items=300, fetch_workers=4, decode_workers=2):
+        self.cache_dir = Path(cache_dir or default_cache_dir())
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.connections = threading.local()
+        self.fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="thumb-fetch")
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="thumb-decode")
+
+    def get(self, video_id):
+        """Return the cached image of a video, or None."""
+        with self.lock:
+            image = self.memory.get(video_id)
+            if image is not None:
+                self.memory.move_to_end(video_id)
+            return image
+
+    def request(self, video_id, url, callback, still_wanted=None):
+        """Load a thumbnail in the background unless it is cached or in flight.
+
+        still_wanted(video_id) is checked before the network fetch, so rows
+        that were scrolled past while queued cost nothing.
+        """
+        with self.lock:
+            if video_id in self.memory:
+                return
+            if video_id in self.pending:
+                self.pending[video_id].append(callback)
+                return
+            self.pending[video_id] = [callback]
+        self.fetch_pool.submit(self.load, video_id, url, still_wanted)
+
+    def cache_path(self, video_id):
+        safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', video_id)
+        return self.cache_dir / f"{safe_id}.jpg"
+
+    def load(self, video_id, url, still_wanted):
+        """Fetch-pool job: read the disk cache or download the image."""
+        try:
+            path = self.cache_path(video_id)
+            if path.exists():
+                self.decode_pool.submit(self.decode, video_id, path.read_bytes(), False)
+                return
+            if still_wanted is not None and not still_wanted(video_id):
+                self.drop(video_id)
+                return
+            data = self.fetch(url)
+            self.decode_pool.submit(self.decode, video_id, data, True)
+        except Exception:
+            self.drop(video_id)
+
+    def fetch(self, url):
+        """GET a URL over this thread's keep-alive connection to its host."""
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        key = (parts.scheme, parts.netloc)
+        pool = getattr(self.connections, 'pool', None)
+        if pool is None:
+            pool = self.connections.pool = {}
+        for attempt in range(2):
+            conn = pool.get(key)
+            if conn is None:
+                conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+                conn = pool[key] = conn_class(parts.netloc, timeout=THUMBNAIL_FETCH_TIMEOUT)
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                # Stale keep-alive connection: reconnect once
+                conn.close()
+                del pool[key]
+                if attempt:
+                    raise
+                continue
+            if response.status != 200:
+                raise OSError(f"HTTP {response.status} for {url}")
+            return data
+
+    def decode(self, video_id, data, store):
+        """Decode-pool job: downscale, write the disk cache and notify."""
+        try:
+            from PIL import Image, ImageOps
+
+            image = Image.open(BytesIO(data))
+            if store:
+                image = ImageOps.fit(image.convert('RGB'), THUMBNAIL_SIZE, Image.LANCZOS)
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                path = self.cache_path(video_id)
+                tmp_path = path.with_suffix('.tmp')
+                image.save(tmp_path, 'JPEG', quality=85)
+                os.replace(tmp_path, path)
+            else:
+                image.load()
+        except Exception:
+            self.drop(video_id)
+            return
+
+        with self.lock:
+            self.memory[video_id] = image
+            self.memory.move_to_end(video_id)
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+            callbacks = self.pending.pop(video_id, [])
+        for callback in callbacks:
+            callback(video_id)
+
+    def drop(self, video_id):
+        """Forget an in-flight request so it can be made again later."""
+        with self.lock:
+            self.pending.pop(video_id, None)
+
+    def close(self):
+        self.fetch_pool.shutdown(wait=False, cancel_futures=True)
+        self.decode_pool.shutdown(wait=False, cancel_futures=True)